@@ -676,11 +676,17 @@ class AIAttendanceManager {
             formData.append('latitude', this.currentLocation.latitude);
             formData.append('longitude', this.currentLocation.longitude);
 
+            // A signed-in student is verified 1:1 against their own face instead of searched for
+            const endpoint = this.currentStudent ? 'verify-face' : 'recognize-face';
+            if (this.currentStudent) {
+                formData.append('student_id', this.currentStudent.id);
+            }
+
             // Show loading
             this.updateFaceStatus('warning', 'Processing face recognition...');
 
             // Send to Python server
-            const response = await fetch(`${this.serverUrl}/recognize-face`, {
+            const response = await fetch(`${this.serverUrl}/${endpoint}`, {
                 method: 'POST',
                 body: formData
             });
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+In-memory attendance state for the AI attendance server
+Answers "already marked today?" without touching the database or the face pipeline
+"""
+
+import threading
+
+
+class MarkedToday:
+    """Set of student IDs marked present on the current date
+
+    ``loader(date_iso)`` returns the student IDs already recorded for a date.
+    The set is reloaded the first time it is used on a new date, so it rolls
+    over at midnight without a timer. The attendance table's unique
+    (student_id, date) index stays authoritative; this only short-circuits.
+    """
+
+    def __init__(self, loader):
+        self.loader = loader
+        self._lock = threading.Lock()
+        self._date = None
+        self._student_ids = set()
+
+    def _refresh(self, date_iso):
+        if self._date != date_iso:
+            self._student_ids = set(self.loader(date_iso))
+            self._date = date_iso
+
+    def contains(self, student_id, date_iso):
+        """True if ``student_id`` is known to be marked on ``date_iso``"""
+        with self._lock:
+            self._refresh(date_iso)
+            return student_id in self._student_ids
+
+    def add(self, student_ids, date_iso):
+        """Record student IDs marked on ``date_iso``"""
+        with self._lock:
+            self._refresh(date_iso)
+            self._student_ids.update(student_ids)
+
+    def invalidate(self):
+        """Force a reload from the database on next use"""
+        with self._lock:
+            self._date = None
+            self._student_ids = set()
+
+    def __len__(self):
+        return len(self._student_ids)
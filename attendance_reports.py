@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Attendance reports for the AI attendance server
+Each report is one indexed JOIN/aggregate query; long listings are paged by keyset, never by OFFSET
+"""
+
+# Longest date range a rollup may cover
+MAX_ROLLUP_DAYS = 366
+
+# Columns of export_page() rows, in order
+EXPORT_COLUMNS = (
+    'id', 'student_id', 'name', 'class', 'section', 'date', 'time', 'status',
+    'confidence_score', 'location_lat', 'location_lng', 'distance_from_school'
+)
+
+
+def class_attendance(conn, class_name, section, date_iso):
+    """[(student_id, name, present)] for one class section on one day"""
+    cursor = conn.execute('''
+        SELECT s.student_id, s.name, a.id IS NOT NULL AS present
+        FROM students s
+        LEFT JOIN attendance_records a
+            ON a.student_id = s.student_id AND a.date = ? AND a.status = 'present'
+        WHERE s.class = ? AND s.section = ?
+        ORDER BY s.student_id
+    ''', (date_iso, class_name, section))
+    return [(student_id, name, bool(present)) for student_id, name, present in cursor.fetchall()]
+
+
+def _class_filter(column_prefix, classes, section):
+    """SQL condition and parameters restricting students to some classes (and a section)"""
+    clauses = []
+    params = []
+    if classes:
+        clauses.append(f"{column_prefix}class IN ({','.join('?' * len(classes))})")
+        params.extend(classes)
+    if section:
+        clauses.append(f"{column_prefix}section = ?")
+        params.append(section)
+    return (' AND '.join(clauses) or '1'), params
+
+
+def class_rollup(conn, date_from, date_to, classes=None, section=None):
+    """Per-day, per-class-section (date, class, section, total_students, present_students) rows
+
+    Every day in the range is listed for every class section that has
+    students, with zero present on days nobody was marked. Present counts
+    come from the class_daily_attendance rollup, one row per day and section,
+    so a range of any length is one read of at most a row per day and
+    section; nothing is written, and no separate cache can go stale.
+    """
+    class_filter, class_params = _class_filter('', classes, section)
+
+    cursor = conn.execute(f'''
+        WITH RECURSIVE days(date) AS (
+            SELECT ? UNION ALL
+            SELECT date(date, '+1 day') FROM days WHERE date < ?
+        ),
+        roster AS (
+            SELECT class, section, COUNT(*) AS total_students
+            FROM students
+            WHERE {class_filter}
+            GROUP BY class, section
+        ),
+        present AS (
+            SELECT date, class, section, present_students
+            FROM class_daily_attendance
+            WHERE date >= ? AND date <= ? AND {class_filter}
+        )
+        SELECT d.date, r.class, r.section, r.total_students, COALESCE(p.present_students, 0)
+        FROM days d
+        CROSS JOIN roster r
+        LEFT JOIN present p ON p.date = d.date AND p.class = r.class AND p.section = r.section
+        ORDER BY d.date, r.class, r.section
+    ''', [date_from, date_to] + class_params + [date_from, date_to] + class_params)
+    return cursor.fetchall()
+
+
+def history_page(conn, student_id, limit, before=None):
+    """One page of a student's records, newest first, as (date, time, id, ...) rows
+
+    ``before`` is the (date, time, id) of the last row of the previous page;
+    the keyset comparison lets each page start straight from the
+    (student_id, date) index however deep into the history it is.
+    """
+    if before is None:
+        cursor = conn.execute('''
+            SELECT date, time, id, status, confidence_score, location_lat, location_lng, distance_from_school
+            FROM attendance_records
+            WHERE student_id = ?
+            ORDER BY date DESC, time DESC, id DESC
+            LIMIT ?
+        ''', (student_id, limit))
+    else:
+        cursor = conn.execute('''
+            SELECT date, time, id, status, confidence_score, location_lat, location_lng, distance_from_school
+            FROM attendance_records
+            WHERE student_id = ? AND (date, time, id) < (?, ?, ?)
+            ORDER BY date DESC, time DESC, id DESC
+            LIMIT ?
+        ''', (student_id, *before, limit))
+    return cursor.fetchall()
+
+
+def export_page(conn, limit, after=None, date_from=None, date_to=None, classes=None, section=None):
+    """Up to ``limit`` attendance rows (EXPORT_COLUMNS) ordered by (date, id), after the (date, id) ``after``
+
+    Callers page through a whole export with short queries, so no
+    connection or read snapshot is held while the rows are sent. CROSS JOIN
+    keeps attendance_records as the outer loop, so each page is read in
+    idx_attendance_date order and stops at ``limit`` instead of sorting every
+    match. Records are attributed to each student's current class.
+    """
+    class_filter, class_params = _class_filter('s.', classes, section)
+    clauses = [class_filter]
+    params = list(class_params)
+    if date_from:
+        clauses.append('a.date >= ?')
+        params.append(date_from)
+    if date_to:
+        clauses.append('a.date <= ?')
+        params.append(date_to)
+    if after is not None:
+        clauses.append('(a.date, a.id) > (?, ?)')
+        params.extend(after)
+
+    cursor = conn.execute(f'''
+        SELECT a.id, a.student_id, s.name, s.class, s.section, a.date, a.time, a.status,
+               a.confidence_score, a.location_lat, a.location_lng, a.distance_from_school
+        FROM attendance_records a
+        CROSS JOIN students s ON s.student_id = a.student_id
+        WHERE {' AND '.join(clauses)}
+        ORDER BY a.date, a.id
+        LIMIT ?
+    ''', params + [limit])
+    return cursor.fetchall()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Incrementally maintained attendance rollups for the AI attendance server
+Monthly per-student and daily/monthly per-class-section counts, updated with every attendance insert
+"""
+
+import sys
+import time
+import argparse
+
+import database
+import migrations
+
+# Rollup tables, in the order rebuild() refills them
+ROLLUP_TABLES = ('student_monthly_attendance', 'class_daily_attendance', 'class_monthly_attendance')
+
+# Upserts adding one new attendance record; parameters are (student_id, date, present)
+_APPLY_SQL = (
+    '''
+    INSERT INTO student_monthly_attendance (student_id, month, total_days, present_days)
+    VALUES (?, substr(?, 1, 7), 1, ?)
+    ON CONFLICT (student_id, month) DO UPDATE SET
+        total_days = total_days + 1,
+        present_days = present_days + excluded.present_days
+    ''',
+    '''
+    INSERT INTO class_daily_attendance (date, class, section, marked_students, present_students)
+    SELECT date, class, section, 1, present
+    FROM (SELECT ? AS student_id, ? AS date, ? AS present) AS record
+    JOIN students ON students.student_id = record.student_id
+    WHERE true
+    ON CONFLICT (date, class, section) DO UPDATE SET
+        marked_students = marked_students + 1,
+        present_students = present_students + excluded.present_students
+    ''',
+    '''
+    INSERT INTO class_monthly_attendance (month, class, section, marked_days, present_days)
+    SELECT substr(date, 1, 7), class, section, 1, present
+    FROM (SELECT ? AS student_id, ? AS date, ? AS present) AS record
+    JOIN students ON students.student_id = record.student_id
+    WHERE true
+    ON CONFLICT (month, class, section) DO UPDATE SET
+        marked_days = marked_days + 1,
+        present_days = present_days + excluded.present_days
+    '''
+)
+
+# Recomputes every rollup from attendance_records, attributing records to the student's current class
+_REBUILD_SQL = (
+    '''
+    INSERT INTO student_monthly_attendance (student_id, month, total_days, present_days)
+    SELECT student_id, substr(date, 1, 7), COUNT(*), SUM(status = 'present')
+    FROM attendance_records
+    GROUP BY student_id, substr(date, 1, 7)
+    ''',
+    '''
+    INSERT INTO class_daily_attendance (date, class, section, marked_students, present_students)
+    SELECT a.date, s.class, s.section, COUNT(*), SUM(a.status = 'present')
+    FROM attendance_records a
+    JOIN students s ON s.student_id = a.student_id
+    GROUP BY a.date, s.class, s.section
+    ''',
+    '''
+    INSERT INTO class_monthly_attendance (month, class, section, marked_days, present_days)
+    SELECT substr(date, 1, 7), class, section, SUM(marked_students), SUM(present_students)
+    FROM class_daily_attendance
+    GROUP BY substr(date, 1, 7), class, section
+    '''
+)
+
+
+def apply(conn, records):
+    """Fold newly inserted attendance records into the rollups, within the caller's transaction
+
+    ``records`` are (student_id, date_iso, status) tuples, one per row the
+    insert actually added (a repeat for the same day must not be passed).
+    """
+    params = [(student_id, date_iso, int(status == 'present')) for student_id, date_iso, status in records]
+    if not params:
+        return
+    for sql in _APPLY_SQL:
+        conn.executemany(sql, params)
+
+
+def rebuild(conn):
+    """Recompute every rollup table from attendance_records, within the caller's transaction
+
+    Returns the number of rows written per table.
+    """
+    counts = {}
+    for table, sql in zip(ROLLUP_TABLES, _REBUILD_SQL):
+        conn.execute(f'DELETE FROM {table}')
+        conn.execute(sql)
+        counts[table] = conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+    return counts
+
+
+def student_month(conn, student_id, month):
+    """(total_days, present_days) of one student in a 'YYYY-MM' month; one primary-key lookup"""
+    row = conn.execute('''
+        SELECT total_days, present_days FROM student_monthly_attendance
+        WHERE student_id = ? AND month = ?
+    ''', (student_id, month)).fetchone()
+    return row if row else (0, 0)
+
+
+def class_month(conn, class_name, section, month):
+    """(marked_days, present_days, school_days) of one class section in a 'YYYY-MM' month
+
+    Days count student-days; ``school_days`` is the number of days anyone in
+    the section was marked.
+    """
+    row = conn.execute('''
+        SELECT marked_days, present_days FROM class_monthly_attendance
+        WHERE month = ? AND class = ? AND section = ?
+    ''', (month, class_name, section)).fetchone()
+    school_days = conn.execute('''
+        SELECT COUNT(*) FROM class_daily_attendance
+        WHERE date >= ? AND date < ? AND class = ? AND section = ?
+    ''', (f"{month}-01", f"{month}-32", class_name, section)).fetchone()[0]
+    marked_days, present_days = row if row else (0, 0)
+    return marked_days, present_days, school_days
+
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description='Rebuild the attendance rollup tables from attendance_records')
+    parser.add_argument('--database', default='face_attendance.db', help='SQLite database path')
+    args = parser.parse_args()
+
+    print("📊 Rebuilding attendance rollups")
+    print("=" * 50)
+
+    try:
+        conn = database.connect(args.database)
+        migrations.migrate(conn)
+
+        started = time.perf_counter()
+        # One write transaction, so a running server never reads a half-built rollup
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            counts = rebuild(conn)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    except Exception as e:
+        print(f"❌ Rebuild failed: {e}")
+        return False
+
+    for table, count in counts.items():
+        print(f"   {table}: {count} rows")
+    print(f"\n✅ Rebuilt in {time.perf_counter() - started:.2f}s")
+    return True
+
+
+if __name__ == '__main__':
+    success = main()
+    if not success:
+        sys.exit(1)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Latency and accuracy of face detection settings
+Runs every (max dimension, model, upsample, num_jitters) combination over a folder of photos
+and compares each encoding with the full-resolution reference encoding of the same photo
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import itertools
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import face_recognition
+import face_pipeline
+
+CONFIDENCE_THRESHOLD = 0.6
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif')
+
+
+def encode(image, max_dimension, model, upsample, num_jitters):
+    """Time detection and encoding of the largest face"""
+    started = time.perf_counter()
+    locations = face_pipeline.detect_faces(image, max_dimension=max_dimension, model=model, upsample=upsample)
+    detected = time.perf_counter()
+    face_location = face_pipeline.largest_face(locations)
+    encoding = None
+    if face_location is not None:
+        encoding = face_pipeline.encode_faces(image, [face_location], num_jitters)[0]
+    finished = time.perf_counter()
+    return encoding, (detected - started) * 1000, (finished - detected) * 1000
+
+
+def run(folder, max_dimensions, models, upsamples, jitters):
+    paths = sorted(
+        os.path.join(folder, name) for name in os.listdir(folder)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    images = [face_recognition.load_image_file(path) for path in paths]
+
+    # Reference: full resolution, HOG, one upsample, one jitter
+    references = [encode(image, 0, 'hog', 1, 1)[0] for image in images]
+    report = []
+
+    for max_dimension, model, upsample, num_jitters in itertools.product(max_dimensions, models, upsamples, jitters):
+        detect_ms, encode_ms, drift, agree, found = [], [], [], [], 0
+        for image, reference in zip(images, references):
+            encoding, detect_time, encode_time = encode(image, max_dimension, model, upsample, num_jitters)
+            detect_ms.append(detect_time)
+            encode_ms.append(encode_time)
+            if encoding is not None:
+                found += 1
+            if encoding is not None and reference is not None:
+                distance = float(np.linalg.norm(encoding - reference))
+                drift.append(distance)
+                agree.append(distance <= CONFIDENCE_THRESHOLD)
+
+        report.append({
+            'max_dimension': max_dimension,
+            'model': model,
+            'upsample': upsample,
+            'num_jitters': num_jitters,
+            'images': len(images),
+            'detection_rate': round(found / len(images), 4) if images else 0.0,
+            'detect_ms_mean': round(float(np.mean(detect_ms)), 2) if detect_ms else 0.0,
+            'encode_ms_mean': round(float(np.mean(encode_ms)), 2) if encode_ms else 0.0,
+            'distance_to_reference_mean': round(float(np.mean(drift)), 4) if drift else None,
+            'self_match_rate': round(float(np.mean(agree)), 4) if agree else None
+        })
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark face detection settings on a folder of photos')
+    parser.add_argument('folder', help='Folder of photos, ideally full-resolution phone pictures')
+    parser.add_argument('--max-dimension', type=int, nargs='+', default=[0, 1600, 1200, 800, 640, 480])
+    parser.add_argument('--model', nargs='+', default=['hog'], choices=['hog', 'cnn'])
+    parser.add_argument('--upsample', type=int, nargs='+', default=[0, 1])
+    parser.add_argument('--num-jitters', type=int, nargs='+', default=[1])
+    parser.add_argument('--output', help='Write the report as JSON to this path')
+    args = parser.parse_args()
+
+    report = run(args.folder, args.max_dimension, args.model, args.upsample, args.num_jitters)
+
+    print(f"{'max_dim':>7} {'model':>5} {'up':>3} {'jit':>3} {'found':>6} {'detect ms':>10} "
+          f"{'encode ms':>10} {'drift':>7} {'self':>6}")
+    for row in report:
+        drift = '-' if row['distance_to_reference_mean'] is None else f"{row['distance_to_reference_mean']:.4f}"
+        agree = '-' if row['self_match_rate'] is None else f"{row['self_match_rate']:.3f}"
+        print(f"{row['max_dimension'] or 'full':>7} {row['model']:>5} {row['upsample']:>3} {row['num_jitters']:>3} "
+              f"{row['detection_rate']:>6.3f} {row['detect_ms_mean']:>10.1f} {row['encode_ms_mean']:>10.1f} "
+              f"{drift:>7} {agree:>6}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Accept/reject agreement of compact gallery snapshots
+Checks that float32 (or float16) centroids give the same decisions as float64 at the 0.6 threshold
+"""
+
+import os
+import sys
+import json
+import sqlite3
+import argparse
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from face_matchers import ExactMatcher
+from gallery_store import GalleryStore
+from matcher_recall import synthetic_gallery, synthetic_probes
+
+CONFIDENCE_THRESHOLD = 0.6
+
+
+def database_gallery(database_path, rng, queries):
+    """Centroids from a real database, probed with its templates plus noise"""
+    conn = sqlite3.connect(database_path)
+    gallery = np.array([
+        np.frombuffer(blob, dtype=np.float64)
+        for (blob,) in conn.execute('SELECT face_encoding FROM students WHERE face_encoding IS NOT NULL')
+    ]).reshape(-1, 128)
+    templates = np.array([
+        np.frombuffer(blob, dtype=np.float64)
+        for (blob,) in conn.execute('SELECT encoding FROM face_templates')
+    ]).reshape(-1, 128)
+    conn.close()
+
+    if len(templates) == 0:
+        templates = gallery
+    probes = templates[rng.integers(0, len(templates), size=queries)]
+    return gallery, probes + rng.normal(0.0, 0.03, size=probes.shape)
+
+
+def round_trip(gallery, dtype):
+    """The matrix as the server would map it from a snapshot of ``dtype``"""
+    with tempfile.TemporaryDirectory() as folder:
+        store = GalleryStore(os.path.join(folder, 'gallery'), dtype=dtype)
+        store.save([str(row) for row in range(len(gallery))], gallery, 0)
+        student_ids, matrix, _, _ = store.load()
+        return np.array(matrix[:len(student_ids)])
+
+
+def compare(gallery, probes, dtype):
+    matcher = ExactMatcher()
+    reference_rows, reference = matcher.search_many(gallery, probes)
+
+    compact = round_trip(gallery, dtype)
+    rows, distances = matcher.search_many(compact, probes.astype(compact.dtype))
+
+    accepted = reference <= CONFIDENCE_THRESHOLD
+    same_decision = accepted == (distances <= CONFIDENCE_THRESHOLD)
+    same_row = np.array(reference_rows) == np.array(rows)
+
+    return {
+        'dtype': np.dtype(dtype).name,
+        'gallery_size': len(gallery),
+        'probes': len(probes),
+        'accepted': int(accepted.sum()),
+        'decision_mismatches': int((~same_decision).sum()),
+        'accepted_row_mismatches': int((~same_row & accepted).sum()),
+        'max_distance_error': float(np.abs(distances - reference).max()),
+        'closest_to_threshold': float(np.abs(reference - CONFIDENCE_THRESHOLD).min()),
+        'bytes_per_encoding': 128 * np.dtype(dtype).itemsize
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--database', help='Check a real face_attendance.db instead of a synthetic gallery')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--dtypes', nargs='+', default=['float32'], choices=['float32', 'float16'])
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write the report as JSON to this path')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    if args.database:
+        galleries = [database_gallery(args.database, rng, args.queries)]
+    else:
+        galleries = []
+        for size in args.sizes:
+            gallery = synthetic_gallery(size, rng)
+            probes, _ = synthetic_probes(gallery, args.queries, rng)
+            galleries.append((gallery, probes))
+
+    report = [compare(gallery, probes, dtype) for gallery, probes in galleries for dtype in args.dtypes]
+
+    print(f"{'dtype':>8} {'size':>8} {'accepted':>9} {'mismatch':>9} {'row diff':>9} {'max err':>10}")
+    for row in report:
+        print(f"{row['dtype']:>8} {row['gallery_size']:>8} {row['accepted']:>9} "
+              f"{row['decision_mismatches']:>9} {row['accepted_row_mismatches']:>9} "
+              f"{row['max_distance_error']:>10.2e}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    # Non-zero exit if any decision changed, so the check can gate switching GALLERY_STORE_DTYPE
+    if any(row['decision_mismatches'] for row in report):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Geofence speed and accuracy report
+Compares the geofence module against the per-request geopy geodesic it replaced
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+import geopy.distance
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from geofence import Geofence
+
+# Decisions may only differ for points this close to the boundary (ellipsoid vs sphere)
+DEFAULT_TOLERANCE_KM = 0.005
+
+
+def geodesic_check(campus, lat, lng):
+    """The original verify_location(): ellipsoidal geodesic against the radius"""
+    distance = geopy.distance.geodesic((lat, lng), (campus['latitude'], campus['longitude'])).kilometers
+    return distance <= campus['radius_km'], distance
+
+
+def sample_points(campus, count, rng):
+    """Points spread over a disc twice the campus radius, denser near the boundary"""
+    radius_deg = 2 * campus['radius_km'] / 111.32
+    bearing = rng.uniform(0, 2 * np.pi, count)
+    reach = radius_deg * np.sqrt(rng.uniform(0, 1, count))
+    lats = campus['latitude'] + reach * np.cos(bearing)
+    lngs = campus['longitude'] + reach * np.sin(bearing) / np.cos(np.radians(campus['latitude']))
+    return lats, lngs
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, (time.perf_counter() - started) * 1000
+
+
+def run(latitudes, radius_km, points, tolerance_km, seed):
+    rng = np.random.default_rng(seed)
+    report = []
+
+    for latitude in latitudes:
+        campus = {'name': f'lat {latitude}', 'latitude': latitude, 'longitude': 77.2090, 'radius_km': radius_km}
+        geofence = Geofence([campus])
+        lats, lngs = sample_points(campus, points, rng)
+
+        reference, geodesic_ms = timed(
+            lambda: [geodesic_check(campus, lat, lng) for lat, lng in zip(lats, lngs)]
+        )
+        single, single_ms = timed(
+            lambda: [geofence.check(lat, lng) for lat, lng in zip(lats, lngs)]
+        )
+
+        expected = np.array([inside for inside, _ in reference])
+        expected_km = np.array([distance for _, distance in reference])
+        single_inside = np.array([result.inside for result in single])
+        single_km = np.array([result.distance_km for result in single])
+
+        mismatched = single_inside != expected
+        # Every disagreement must sit within the tolerance band around the boundary
+        out_of_tolerance = mismatched & (np.abs(expected_km - radius_km) > tolerance_km)
+
+        report.append({
+            'latitude': latitude,
+            'points': points,
+            'mismatches': int(mismatched.sum()),
+            'mismatches_out_of_tolerance': int(out_of_tolerance.sum()),
+            'max_distance_error_m': round(float(np.abs(single_km - expected_km).max() * 1000), 3),
+            'geodesic_us_per_check': round(geodesic_ms * 1000 / points, 3),
+            'geofence_us_per_check': round(single_ms * 1000 / points, 3)
+        })
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--latitudes', type=float, nargs='+', default=[0.0, 28.6139, 51.5, 64.0])
+    parser.add_argument('--radius-km', type=float, default=0.5)
+    parser.add_argument('--points', type=int, default=20000)
+    parser.add_argument('--tolerance-km', type=float, default=DEFAULT_TOLERANCE_KM)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write the report as JSON to this path')
+    args = parser.parse_args()
+
+    report = run(args.latitudes, args.radius_km, args.points, args.tolerance_km, args.seed)
+
+    print(f"{'lat':>8} {'mismatch':>9} {'bad':>5} {'max err m':>10} "
+          f"{'geopy us':>9} {'fence us':>9}")
+    for row in report:
+        print(f"{row['latitude']:>8.2f} {row['mismatches']:>9} {row['mismatches_out_of_tolerance']:>5} "
+              f"{row['max_distance_error_m']:>10.3f} {row['geodesic_us_per_check']:>9.2f} "
+              f"{row['geofence_us_per_check']:>9.2f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    # Non-zero exit so the accuracy check can gate a deployment script
+    if any(row['mismatches_out_of_tolerance'] for row in report):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
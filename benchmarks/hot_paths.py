@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the recognition and attendance hot paths
+Times start-up, gallery loading, matching, geofencing, the stats queries and whole requests on synthetic data, offline
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import subprocess
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import numpy as np
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, ROOT)
+
+from matcher_recall import synthetic_gallery, synthetic_probes, summarize
+
+CLASS_SIZE = 40  # Students per class section of the synthetic school
+CLASSES = 12
+
+
+def timed(func, repeats):
+    """Latencies (ms) of ``repeats`` calls to ``func``"""
+    latencies = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        func()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return np.array(latencies)
+
+
+def student_class(row):
+    """(class, section) of a synthetic student; sections fill up CLASS_SIZE at a time"""
+    section_index = row // CLASS_SIZE
+    return str(section_index % CLASSES + 1), f"S{section_index // CLASSES}"
+
+
+def seed_database(server, gallery, history_days, rng):
+    """Students with centroid encodings and ~90% attendance over the past ``history_days`` days"""
+    import attendance_rollups
+
+    today = date.today()
+    with server.db_pool.transaction() as conn:
+        conn.executemany('''
+            INSERT INTO students (student_id, name, class, section, face_encoding)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (
+            (f"STU{row:06d}", f"Student {row}", *student_class(row), encoding.tobytes())
+            for row, encoding in enumerate(gallery)
+        ))
+
+        for offset in range(1, history_days + 1):
+            day = (today - timedelta(days=offset)).isoformat()
+            present = np.flatnonzero(rng.random(len(gallery)) < 0.9)
+            conn.executemany('''
+                INSERT INTO attendance_records (student_id, date, time, status, confidence_score)
+                VALUES (?, ?, '08:30:00', 'present', 90.0)
+            ''', ((f"STU{row:06d}", day) for row in present))
+
+        attendance_rollups.rebuild(conn)
+
+
+def bench_size(workdir, size, queries, history_days, requests, concurrency, seed):
+    """Every benchmark for one gallery size, run in a fresh interpreter in an empty ``workdir``"""
+    os.chdir(workdir)
+    import logging
+    logging.disable(logging.INFO)
+
+    started = time.perf_counter()
+    import face_recognition_server as server
+    import_seconds = time.perf_counter() - started
+
+    rng = np.random.default_rng(seed)
+    gallery = synthetic_gallery(size, rng)
+    probes = synthetic_probes(gallery, queries, rng)
+
+    server.init_database()
+    started = time.perf_counter()
+    seed_database(server, gallery, history_days, rng)
+    seed_seconds = time.perf_counter() - started
+
+    # Uploads carry the encoding itself: detection is not part of these paths
+    # (see detection_settings.py), and real photos cannot be generated offline
+    server.encode_face_from_image = lambda image_source, num_jitters=None, metrics=None: np.frombuffer(image_source)
+
+    results = []
+
+    def record(name, latencies, **extra):
+        results.append({'gallery_size': size, 'benchmark': name, 'calls': len(latencies),
+                        **summarize(latencies), **extra})
+
+    record('load_all_face_encodings', timed(server.load_all_face_encodings, 3))
+    # The first load finds no snapshot and builds it from the database
+    record('load_face_gallery_rebuild', timed(server.load_face_gallery, 1))
+    record('load_face_gallery_snapshot', timed(server.load_face_gallery, 3))
+
+    face_gallery = server.get_face_gallery()
+    probe_iter = iter(probes)
+    record('match', timed(lambda: face_gallery.match(next(probe_iter)), queries))
+    batch = probes[:server.BATCH_MAX_SIZE]
+    record('match_many', timed(lambda: face_gallery.match_many(batch), 20), batch_size=len(batch))
+
+    points = np.column_stack([
+        server.SCHOOL_LOCATION['latitude'] + rng.normal(0.0, 0.005, size=queries),
+        server.SCHOOL_LOCATION['longitude'] + rng.normal(0.0, 0.005, size=queries)
+    ])
+    point_iter = iter(points)
+    record('verify_location', timed(lambda: server.verify_location(*next(point_iter)), queries))
+
+    client = server.app.test_client()
+    student_id = 'STU000000'
+    class_name, section = student_class(0)
+    reads = [
+        ('get_attendance_stats', server.get_attendance_stats, f"/api/attendance-stats/{student_id}",
+         {'student_id': student_id}),
+        ('get_class_attendance', server.get_class_attendance, f"/api/class-attendance/{class_name}/{section}",
+         {'class_name': class_name, 'section': section}),
+        ('get_attendance_history', server.get_attendance_history, f"/api/attendance-history/{student_id}",
+         {'student_id': student_id})
+    ]
+    for name, view, url, view_args in reads:
+        # The view itself, bypassing the response cache, then whole requests that the cache answers
+        def call_view():
+            with server.app.test_request_context(url):
+                view.__wrapped__(**view_args)
+        record(name, timed(call_view, 200))
+        record(f"{name}_request_cached", timed(lambda: client.get(url), 200))
+        etag = client.get(url).headers['ETag']
+        record(f"{name}_request_304", timed(lambda: client.get(url, headers={'If-None-Match': etag}), 200))
+
+    location = {'latitude': server.SCHOOL_LOCATION['latitude'], 'longitude': server.SCHOOL_LOCATION['longitude']}
+    # Drawn up front: request threads must not share the generator
+    noise = rng.normal(0.0, 0.01, size=(1024, 128))
+
+    def check_in(row, path='/api/recognize-face', claim=False):
+        """One check-in for gallery row ``row``; each student is only marked once"""
+        probe = gallery[row] + noise[row % len(noise)]
+        data = dict(location, image=(io.BytesIO(probe.tobytes()), 'checkin.jpg'))
+        if claim:
+            data['student_id'] = f"STU{row:06d}"
+        response = server.app.test_client().post(path, data=data)
+        assert response.status_code == 200, response.get_json()
+
+    rows = iter(rng.permutation(size))
+    record('recognize_face_request', timed(lambda: check_in(next(rows)), min(requests, size // 3)))
+    record('verify_face_request', timed(
+        lambda: check_in(next(rows), '/api/verify-face', claim=True), min(requests, size // 3)
+    ))
+
+    # Concurrent check-ins share micro-batches; throughput is requests per second of wall time
+    concurrent_rows = [next(rows) for _ in range(min(requests, size // 3))]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = np.array(list(pool.map(lambda row: timed(lambda: check_in(row), 1)[0], concurrent_rows)))
+    elapsed = time.perf_counter() - started
+    record('recognize_face_concurrent', latencies, concurrency=concurrency,
+           requests_per_second=round(len(concurrent_rows) / elapsed, 1))
+
+    return {
+        'gallery_size': size,
+        'history_days': history_days,
+        'server_import_seconds': round(import_seconds, 3),
+        'seed_seconds': round(seed_seconds, 2),
+        'results': results
+    }
+
+
+def bench_startup(workdir, warm_up, results):
+    """Restart on the database and gallery snapshot left in ``workdir``, in a fresh interpreter
+
+    Puts the import, create_app() and (with ``warm_up``) model loading times on ``results``.
+    """
+    os.chdir(workdir)
+    import logging
+    logging.disable(logging.INFO)
+
+    started = time.perf_counter()
+    import face_recognition_server as server
+    imported = time.perf_counter()
+    server.create_app(warm_up=False)
+    ready = time.perf_counter()
+
+    startup = {
+        'import_seconds': round(imported - started, 3),
+        'create_app_seconds': round(ready - imported, 3),
+        # Read-only endpoints are servable from here on, without the vision models
+        'vision_loaded': 'face_recognition' in sys.modules
+    }
+    if warm_up:
+        server.recognition_engine.warm_up()
+        startup['warm_up_seconds'] = round(time.perf_counter() - ready, 3)
+        server.recognition_engine.shutdown()
+    results.put(startup)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline):
+    """Print p50 changes against an earlier report"""
+    previous = {
+        (row['gallery_size'], row['benchmark']): row
+        for size_report in baseline['sizes'] for row in size_report['results']
+    }
+    print(f"\nAgainst {baseline.get('commit') or 'baseline'} (p50, + is slower):")
+    for size_report in report['sizes']:
+        for row in size_report['results']:
+            before = previous.get((row['gallery_size'], row['benchmark']))
+            if before and before['p50_ms'] > 0:
+                change = (row['p50_ms'] / before['p50_ms'] - 1) * 100
+                print(f"{row['gallery_size']:>8}  {row['benchmark']:<40} {before['p50_ms']:>10.3f} "
+                      f"-> {row['p50_ms']:>10.3f} ms  {change:+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--queries', type=int, default=500, help='Probes and points for matching and geofence timings')
+    parser.add_argument('--history-days', type=int, default=20, help='Days of synthetic attendance per student')
+    parser.add_argument('--requests', type=int, default=200, help='Check-in requests per end-to-end benchmark')
+    parser.add_argument('--concurrency', type=int, default=8, help='Threads for the concurrent check-in benchmark')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='hot_paths.json', help='Write the report as JSON to this path')
+    parser.add_argument('--baseline', help='Earlier report to compare against')
+    parser.add_argument('--warm-up', action='store_true',
+                        help='Also time loading the face_recognition models into the recognition workers')
+    args = parser.parse_args()
+
+    report = {
+        'commit': git_commit(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'cpu_count': os.cpu_count(),
+        'seed': args.seed,
+        'sizes': []
+    }
+
+    # One fresh process per size, so each server import, database and gallery starts cold
+    context = multiprocessing.get_context('spawn')
+    for size in args.sizes:
+        workdir = tempfile.mkdtemp(prefix='hot_paths_')
+        with context.Pool(1) as pool:
+            size_report = pool.apply(bench_size, (
+                workdir, size, args.queries, args.history_days, args.requests, args.concurrency, args.seed
+            ))
+
+        # Not a pool worker: warm-up starts the engine's own worker processes
+        results = context.SimpleQueue()
+        process = context.Process(target=bench_startup, args=(workdir, args.warm_up, results))
+        process.start()
+        process.join()
+        size_report['startup'] = results.get() if process.exitcode == 0 else None
+        report['sizes'].append(size_report)
+
+        print(f"\n{size} students ({size_report['history_days']} days of history, "
+              f"server import {size_report['server_import_seconds']:.2f}s)")
+        startup = size_report['startup']
+        if startup:
+            warm_up = f", model warm-up {startup['warm_up_seconds']:.2f}s" if 'warm_up_seconds' in startup else ''
+            print(f"Restart: import {startup['import_seconds']:.2f}s, create_app {startup['create_app_seconds']:.2f}s"
+                  f"{warm_up}; vision models loaded before warm-up: {startup['vision_loaded']}")
+        print(f"{'benchmark':<40} {'calls':>6} {'mean ms':>10} {'p50 ms':>10} {'p95 ms':>10}")
+        for row in size_report['results']:
+            print(f"{row['benchmark']:<40} {row['calls']:>6} {row['mean_ms']:>10.3f} "
+                  f"{row['p50_ms']:>10.3f} {row['p95_ms']:>10.3f}")
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
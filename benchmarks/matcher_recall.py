@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Recall vs latency report for the face matcher backends
+Compares the IVF index against exact brute-force search on a synthetic gallery
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from face_matchers import ExactMatcher, IVFMatcher
+
+CONFIDENCE_THRESHOLD = 0.6
+
+# Calibrated like dlib embeddings of a large school: a new photo lands ~0.45 from the
+# enrolled face, and the nearest other student is only just past the 0.6 threshold
+# (median ~0.64). Loose clusters keep faces spread across IVF list boundaries.
+CLUSTER_SPREAD = 0.03
+FACE_SPREAD = 0.045
+PROBE_NOISE = 0.04
+
+
+def synthetic_gallery(size, rng, clusters=256):
+    """Loosely clustered 128-d encodings shaped like dlib face embeddings"""
+    centers = rng.normal(0.0, CLUSTER_SPREAD, size=(clusters, 128))
+    labels = rng.integers(0, clusters, size=size)
+    return centers[labels] + rng.normal(0.0, FACE_SPREAD, size=(size, 128))
+
+
+def synthetic_probes(gallery, count, rng, impostor_ratio=0.2):
+    """Noisy copies of enrolled faces plus a share of unknown faces
+
+    Returns (probes, sources): the gallery row each probe was taken from, -1 for unknown faces.
+    """
+    sources = rng.integers(0, len(gallery), size=count)
+    probes = gallery[sources] + rng.normal(0.0, PROBE_NOISE, size=(count, 128))
+    impostors = rng.random(count) < impostor_ratio
+    probes[impostors] = synthetic_gallery(int(impostors.sum()), rng)
+    sources[impostors] = -1
+    return probes, sources
+
+
+def distance_profile(gallery, probes, sources, sample=200):
+    """Median distance of genuine probes to their source, and of enrolled faces to their nearest neighbour"""
+    genuine = sources >= 0
+    genuine_distances = np.linalg.norm(probes[genuine] - gallery[sources[genuine]], axis=1)
+
+    rows = gallery[:sample]
+    squared = (rows ** 2).sum(axis=1)[:, None] - 2.0 * rows @ gallery.T + (gallery ** 2).sum(axis=1)[None, :]
+    squared[np.arange(len(rows)), np.arange(len(rows))] = np.inf
+    neighbour_distances = np.sqrt(np.maximum(squared.min(axis=1), 0.0))
+    return float(np.median(genuine_distances)), float(np.median(neighbour_distances))
+
+
+def time_matcher(matcher, gallery, probes):
+    results = []
+    latencies = []
+    for probe in probes:
+        started = time.perf_counter()
+        results.append(matcher.search(gallery, probe))
+        latencies.append((time.perf_counter() - started) * 1000)
+    return results, np.array(latencies)
+
+
+def summarize(latencies):
+    return {
+        'mean_ms': round(float(latencies.mean()), 4),
+        'p50_ms': round(float(np.percentile(latencies, 50)), 4),
+        'p95_ms': round(float(np.percentile(latencies, 95)), 4)
+    }
+
+
+def run(sizes, nprobes, queries, seed):
+    rng = np.random.default_rng(seed)
+    report = []
+
+    for size in sizes:
+        gallery = synthetic_gallery(size, rng)
+        student_ids = [f"STU{row:06d}" for row in range(size)]
+        probes, sources = synthetic_probes(gallery, queries, rng)
+        genuine_distance, neighbour_distance = distance_profile(gallery, probes, sources)
+
+        exact_results, exact_latencies = time_matcher(ExactMatcher(), gallery, probes)
+        report.append({'gallery_size': size, 'backend': 'exact', 'recall_at_1': 1.0,
+                       'decision_agreement': 1.0,
+                       'genuine_distance_median': round(genuine_distance, 3),
+                       'neighbour_distance_median': round(neighbour_distance, 3),
+                       **summarize(exact_latencies)})
+
+        started = time.perf_counter()
+        ivf = IVFMatcher(min_train_size=0, seed=seed)
+        ivf.build(gallery, student_ids)
+        build_seconds = time.perf_counter() - started
+
+        for nprobe in nprobes:
+            ivf.nprobe = nprobe
+            ivf_results, ivf_latencies = time_matcher(ivf, gallery, probes)
+            # Recall only counts probes the exact matcher accepts; rejected probes have no identity
+            same_row = [
+                a[0] == b[0] for a, b in zip(exact_results, ivf_results)
+                if a[1] <= CONFIDENCE_THRESHOLD
+            ]
+            same_decision = [
+                (a[1] <= CONFIDENCE_THRESHOLD) == (b[1] <= CONFIDENCE_THRESHOLD)
+                for a, b in zip(exact_results, ivf_results)
+            ]
+            report.append({
+                'gallery_size': size,
+                'backend': f"ivf(nlist={len(ivf.centroids)}, nprobe={nprobe})",
+                'recall_at_1': round(float(np.mean(same_row)), 4),
+                'decision_agreement': round(float(np.mean(same_decision)), 4),
+                'build_seconds': round(build_seconds, 2),
+                **summarize(ivf_latencies)
+            })
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 4, 8, 16, 32])
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write the report as JSON to this path')
+    args = parser.parse_args()
+
+    report = run(args.sizes, args.nprobe, args.queries, args.seed)
+
+    print(f"{'size':>8}  {'backend':<28} {'recall@1':>9} {'agree':>7} {'mean ms':>9} {'p95 ms':>9}")
+    for row in report:
+        print(f"{row['gallery_size']:>8}  {row['backend']:<28} {row['recall_at_1']:>9.4f} "
+              f"{row['decision_agreement']:>7.4f} {row['mean_ms']:>9.3f} {row['p95_ms']:>9.3f}")
+        if 'genuine_distance_median' in row:
+            print(f"{'':>10}(genuine probe distance {row['genuine_distance_median']:.3f}, "
+                  f"nearest enrolled neighbour {row['neighbour_distance_median']:.3f})")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
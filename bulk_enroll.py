@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Bulk face enrolment for AI Face Recognition Attendance System
+Encodes a directory or zip of student photos listed in a CSV manifest
+"""
+
+import os
+import sys
+import csv
+import time
+import zipfile
+import argparse
+from multiprocessing import Pool
+
+import face_recognition
+
+import database
+import face_pipeline
+import face_templates
+import migrations
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif')
+MANIFEST_FIELDS = ('student_id', 'name', 'class', 'section')
+
+
+def read_manifest(manifest_path):
+    """Read student rows from the CSV manifest"""
+    with open(manifest_path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        missing = [field for field in MANIFEST_FIELDS if field not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"Manifest is missing columns: {', '.join(missing)}")
+        return [
+            {key: (value or '').strip() for key, value in row.items() if key}
+            for row in reader
+        ]
+
+
+def list_images(source):
+    """Map image file names (and bare stems) to paths in a directory or zip"""
+    images = {}
+
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            names = [name for name in archive.namelist() if not name.endswith('/')]
+    else:
+        names = [
+            os.path.relpath(os.path.join(root, name), source)
+            for root, _, files in os.walk(source) for name in files
+        ]
+
+    for name in names:
+        if name.lower().endswith(IMAGE_EXTENSIONS):
+            base = os.path.basename(name)
+            images[base] = name
+            images.setdefault(os.path.splitext(base)[0], name)
+
+    return images
+
+
+def resolve_image(student, images):
+    """Find a student's photo via the optional 'image' column or their student_id"""
+    if student.get('image'):
+        return images.get(os.path.basename(student['image']))
+    return images.get(student['student_id'])
+
+
+_worker_source = None
+_worker_archive = None
+
+
+def init_worker(source):
+    """Worker initializer: open the zip once per process instead of once per photo"""
+    global _worker_source, _worker_archive
+    _worker_source = source
+    _worker_archive = zipfile.ZipFile(source) if zipfile.is_zipfile(source) else None
+
+
+def encode_job(job):
+    """Worker: detect and encode the face in one photo"""
+    student, name, settings = job
+    try:
+        if _worker_archive is not None:
+            with _worker_archive.open(name) as f:
+                image = face_recognition.load_image_file(f)
+        else:
+            image = face_recognition.load_image_file(os.path.join(_worker_source, name))
+
+        face_locations = face_pipeline.detect_faces(
+            image,
+            max_dimension=settings['max_dimension'],
+            model=settings['model'],
+            upsample=settings['upsample']
+        )
+        if not face_locations:
+            return student, name, None, 'No face detected in image'
+        if len(face_locations) > 1:
+            return student, name, None, f'{len(face_locations)} faces detected in image'
+
+        face_encoding = face_pipeline.encode_faces(image, face_locations, settings['num_jitters'])[0]
+        return student, name, face_encoding.tobytes(), None
+    except Exception as e:
+        return student, name, None, str(e)
+
+
+def enrolled_student_ids(conn):
+    """Students that already have a face encoding (skipped when resuming)"""
+    cursor = conn.cursor()
+    cursor.execute('SELECT student_id FROM students WHERE face_encoding IS NOT NULL')
+    return set(row[0] for row in cursor.fetchall())
+
+
+def write_batch(conn, batch):
+    """Write one batch of encoded students in a single transaction
+
+    Each photo is stored as a registration template; a student enrolled
+    before keeps their earlier templates.
+    """
+    conn.execute('BEGIN IMMEDIATE')
+    with conn:
+        conn.executemany('''
+            INSERT INTO students
+            (student_id, name, class, section, face_image_path)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (student_id) DO UPDATE SET
+                name = excluded.name,
+                class = excluded.class,
+                section = excluded.section,
+                face_image_path = excluded.face_image_path
+        ''', [(student_id, name, class_name, section, image_path)
+              for student_id, name, class_name, section, _, image_path in batch])
+
+        for student_id, _, _, _, encoding_blob, _ in batch:
+            face_templates.add_template(conn, student_id, face_templates.decode(encoding_blob), 'registration')
+
+
+def enroll(source, manifest_path, database_path='face_attendance.db', workers=None,
+           batch_size=200, num_jitters=1, max_dimension=800, model='hog', upsample=1,
+           resume=True, failures_path=None):
+    """Run the bulk enrolment and return a summary dict"""
+    students = read_manifest(manifest_path)
+    images = list_images(source)
+
+    is_zip = zipfile.is_zipfile(source)
+
+    conn = database.connect(database_path)
+    migrations.migrate(conn)
+    manifest_ids = set(student['student_id'] for student in students)
+    skipped = (enrolled_student_ids(conn) & manifest_ids) if resume else set()
+
+    settings = {
+        'max_dimension': max_dimension,
+        'model': model,
+        'upsample': upsample,
+        'num_jitters': num_jitters
+    }
+
+    jobs = []
+    failures = []
+    for student in students:
+        if student['student_id'] in skipped:
+            continue
+        name = resolve_image(student, images)
+        if name is None:
+            failures.append((student['student_id'], student.get('image', ''), 'Image not found'))
+            continue
+        jobs.append((student, name, settings))
+
+    print(f"📋 {len(students)} students in manifest, {len(skipped)} already enrolled, {len(jobs)} to encode")
+
+    started = time.perf_counter()
+    enrolled = 0
+    batch = []
+
+    with Pool(processes=workers, initializer=init_worker, initargs=(source,)) as pool:
+        for done, (student, name, encoding_blob, error) in enumerate(
+                pool.imap_unordered(encode_job, jobs, chunksize=4), start=1):
+            if error:
+                failures.append((student['student_id'], name, error))
+            else:
+                image_path = f"{source}:{name}" if is_zip else os.path.join(source, name)
+                batch.append((
+                    student['student_id'], student['name'], student['class'],
+                    student['section'], encoding_blob, image_path
+                ))
+
+            if len(batch) >= batch_size:
+                write_batch(conn, batch)
+                enrolled += len(batch)
+                batch = []
+
+            if done % 100 == 0:
+                elapsed = time.perf_counter() - started
+                print(f"   {done}/{len(jobs)} photos ({done / elapsed:.1f} photos/s)")
+
+    if batch:
+        write_batch(conn, batch)
+        enrolled += len(batch)
+    conn.close()
+
+    elapsed = time.perf_counter() - started
+
+    if failures_path and failures:
+        with open(failures_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['student_id', 'image', 'error'])
+            writer.writerows(failures)
+
+    return {
+        'students': len(students),
+        'skipped': len(skipped),
+        'enrolled': enrolled,
+        'failed': len(failures),
+        'failures': failures,
+        'seconds': elapsed,
+        'photos_per_second': len(jobs) / elapsed if elapsed > 0 else 0.0
+    }
+
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description='Bulk enrol student faces from a photo directory or zip')
+    parser.add_argument('source', help='Directory or .zip file of student photos')
+    parser.add_argument('manifest', help='CSV with student_id,name,class,section[,image] columns')
+    parser.add_argument('--database', default='face_attendance.db', help='SQLite database path')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    parser.add_argument('--batch-size', type=int, default=200, help='Students written per transaction')
+    parser.add_argument('--num-jitters', type=int, default=1, help='Re-samples per face when encoding; more gives steadier templates')
+    parser.add_argument('--max-dimension', type=int, default=800, help='Longest side used for detection (0 = full size)')
+    parser.add_argument('--model', choices=['hog', 'cnn'], default='hog', help='Face detector model')
+    parser.add_argument('--upsample', type=int, default=1, help='Detector upsampling passes')
+    parser.add_argument('--no-resume', action='store_true', help='Re-encode students that already have a face')
+    parser.add_argument('--failures', default='bulk_enroll_failures.csv', help='CSV report of failed photos')
+    args = parser.parse_args()
+
+    print("🤖 Bulk Face Enrolment")
+    print("=" * 50)
+
+    try:
+        summary = enroll(
+            args.source, args.manifest, database_path=args.database, workers=args.workers,
+            batch_size=args.batch_size, num_jitters=args.num_jitters,
+            max_dimension=args.max_dimension, model=args.model, upsample=args.upsample,
+            resume=not args.no_resume, failures_path=args.failures
+        )
+    except Exception as e:
+        print(f"❌ Bulk enrolment failed: {e}")
+        return False
+
+    print(f"\n✅ Enrolled {summary['enrolled']} students in {summary['seconds']:.1f}s "
+          f"({summary['photos_per_second']:.1f} photos/s)")
+    print(f"⏭️  Skipped {summary['skipped']} already enrolled students")
+
+    if summary['failures']:
+        print(f"⚠️  {summary['failed']} photos failed, see {args.failures}:")
+        for student_id, name, error in summary['failures'][:20]:
+            print(f"   {student_id} ({name}): {error}")
+
+    print("\nRestart the attendance server to load the new faces into its gallery.")
+    return True
+
+
+if __name__ == '__main__':
+    success = main()
+    if not success:
+        sys.exit(1)
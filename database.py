@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+SQLite data-access layer for the AI attendance server
+Pooled, WAL-journaled connections shared by every route
+"""
+
+import time
+import queue
+import sqlite3
+import threading
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Pragmas applied to every new connection
+CONNECTION_PRAGMAS = (
+    ('journal_mode', 'WAL'),      # readers no longer block behind the attendance writer
+    ('synchronous', 'NORMAL'),    # safe with WAL, avoids an fsync per commit
+    ('cache_size', -20000),       # ~20 MB page cache per connection
+    ('mmap_size', 268435456),     # 256 MB memory-mapped reads
+    ('temp_store', 'MEMORY'),
+)
+
+
+def connect(path, timeout=5.0, cached_statements=256):
+    """Open a tuned connection
+
+    Connections run in autocommit mode; writes use ConnectionPool.transaction()
+    (or an explicit BEGIN). sqlite3 keeps up to ``cached_statements`` compiled
+    statements per connection, so parameterised queries are prepared once.
+    """
+    conn = sqlite3.connect(
+        path,
+        timeout=timeout,
+        isolation_level=None,
+        check_same_thread=False,
+        cached_statements=cached_statements
+    )
+    for pragma, value in CONNECTION_PRAGMAS:
+        conn.execute(f'PRAGMA {pragma} = {value}')
+    return conn
+
+
+class ConnectionPool:
+    """Bounded pool of long-lived connections checked out per request thread
+
+    With ``metrics`` (a PipelineMetrics) the time spent waiting for an idle
+    connection is recorded as ``pool_wait`` and the time BEGIN IMMEDIATE
+    waits for SQLite's write lock as ``lock_wait``.
+    """
+
+    def __init__(self, path, size=8, timeout=5.0, metrics=None):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self.metrics = metrics
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection for the duration of a ``with`` block"""
+        started = time.perf_counter()
+        conn = self._acquire()
+        if self.metrics is not None:
+            self.metrics.record('pool_wait', (time.perf_counter() - started) * 1000)
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+
+    @contextmanager
+    def transaction(self):
+        """Check out a connection inside BEGIN IMMEDIATE ... COMMIT
+
+        Taking the write lock up front avoids deadlocks when a read is
+        followed by a write in the same transaction.
+        """
+        with self.connection() as conn:
+            started = time.perf_counter()
+            conn.execute('BEGIN IMMEDIATE')
+            if self.metrics is not None:
+                self.metrics.record('lock_wait', (time.perf_counter() - started) * 1000)
+            try:
+                yield conn
+            except Exception:
+                conn.rollback()
+                raise
+            conn.commit()
+
+    def close(self):
+        """Close every idle connection"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+
+        if create:
+            try:
+                return connect(self.path, timeout=self.timeout)
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError(
+                f"No database connection available after {self.timeout}s"
+            )
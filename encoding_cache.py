@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Upload encoding cache for the AI attendance server
+Remembers the faces found in recently uploaded images, keyed by a hash of the image bytes
+"""
+
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Bookkeeping charged per entry on top of its arrays (key, tuple, dict slot)
+ENTRY_OVERHEAD_BYTES = 256
+
+
+def _freeze(value):
+    """Read-only copy of an encoding, so a cached result cannot be changed by a caller"""
+    if value is None:
+        return None
+    value = np.array(value, dtype=np.float64)
+    value.setflags(write=False)
+    return value
+
+
+def _size(result):
+    if result is None:
+        return ENTRY_OVERHEAD_BYTES
+    if isinstance(result, np.ndarray):
+        return ENTRY_OVERHEAD_BYTES + result.nbytes
+    locations, encodings = result
+    return ENTRY_OVERHEAD_BYTES + 32 * len(locations) + sum(encoding.nbytes for encoding in encodings)
+
+
+class UploadEncodingCache:
+    """LRU of detection/encoding results keyed by the SHA-256 of the uploaded bytes
+
+    A retried check-in (rejected for location, already marked, or resent by
+    a flaky network) uploads the very same bytes, so its result is reused
+    instead of decoding and encoding the image again. "No face" results are
+    kept too. Keys also carry the call's parameters (``kind``, e.g.
+    ``'face:1'`` for one face at one jitter), since the same photo gives a
+    different result at registration. Entries expire after ``ttl_seconds``
+    and the cache holds at most ``max_entries`` and ``max_bytes``; the image
+    bytes themselves are never kept.
+    """
+
+    def __init__(self, max_entries=2048, max_bytes=16 * 1024 * 1024, ttl_seconds=300.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(image_bytes, kind):
+        """Cache key of ``image_bytes`` encoded as ``kind``"""
+        return f"{kind}:{hashlib.sha256(image_bytes).hexdigest()}"
+
+    def get_or_compute(self, image_bytes, kind, compute):
+        """Result of ``compute()`` for these bytes, computed only on a miss
+
+        ``compute`` returns an encoding (or None) or a (locations, encodings)
+        pair. Concurrent misses of the same upload each compute; the result
+        is identical, so the last one simply replaces the first.
+        """
+        if not self.max_entries:
+            return compute()
+
+        key = self.key(image_bytes, kind)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+
+        result = compute()
+        if isinstance(result, tuple):
+            locations, encodings = result
+            result = (list(locations), [_freeze(encoding) for encoding in encodings])
+        else:
+            result = _freeze(result)
+        size = _size(result)
+        if size > self.max_bytes:
+            return result
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (result, time.monotonic() + self.ttl_seconds, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+        return result
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses
+            }
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Resident face gallery for the AI attendance server
+Keeps every student's centroid encoding in one contiguous NumPy matrix
+"""
+
+import threading
+import numpy as np
+from face_matchers import ExactMatcher
+
+ENCODING_SIZE = 128
+
+
+class FaceGallery:
+    """In-memory (N x 128) encoding matrix with parallel student metadata
+
+    Each row is a student's centroid. With a ``template_loader``
+    (student_id -> (k x 128) array or None) the best centroid match is
+    reranked against all of that student's templates and the closest
+    template distance is returned.
+    """
+
+    def __init__(self, matcher=None, initial_capacity=1024, dtype=np.float32, template_loader=None):
+        self._lock = threading.RLock()
+        self.matcher = matcher or ExactMatcher()
+        self.dtype = np.dtype(dtype)
+        self.template_loader = template_loader
+        self._matrix = np.empty((initial_capacity, ENCODING_SIZE), dtype=self.dtype)
+        self._size = 0
+        self._students = []
+        self._student_ids = []
+        self._rows = {}
+        self._partitions = {}
+        self.loaded = False
+
+    def __len__(self):
+        return self._size
+
+    def load_matrix(self, student_ids, matrix, students):
+        """Adopt a matrix whose first N rows align with ``student_ids``, without copying it
+
+        ``students`` maps student_id to its metadata dict. Rows past N are
+        spare capacity for registrations. A copy-on-write memory map (see
+        GalleryStore.load()) is changed in place, so only the pages holding
+        changed rows become private; a read-only matrix is copied when the
+        gallery is first changed.
+        """
+        with self._lock:
+            metadata = [self._metadata(students[student_id]) for student_id in student_ids]
+            partitions = {}
+            for row, student in enumerate(metadata):
+                partitions.setdefault(self._partition_key(student), []).append(row)
+
+            self._matrix = matrix
+            self._size = len(student_ids)
+            self._students = metadata
+            self._student_ids = list(student_ids)
+            self._rows = {student_id: row for row, student_id in enumerate(student_ids)}
+            self._partitions = partitions
+            self.matcher.build(self._matrix[:self._size], self._student_ids)
+            self.loaded = True
+
+    def upsert(self, student_id, name, class_name, section, face_encoding):
+        """Add or replace a student's centroid after registration"""
+        with self._lock:
+            student = self._metadata({
+                'student_id': student_id,
+                'name': name,
+                'class': class_name,
+                'section': section
+            })
+
+            row = self._rows.get(student_id)
+            if row is None:
+                self._grow(self._size + 1)
+                row = self._size
+                self._rows[student_id] = row
+                self._students.append(student)
+                self._student_ids.append(student_id)
+                self._size += 1
+            else:
+                self._grow(self._size)
+                self._partitions[self._partition_key(self._students[row])].remove(row)
+                self._students[row] = student
+
+            self._partitions.setdefault(self._partition_key(student), []).append(row)
+
+            self._matrix[row] = face_encoding
+            self.matcher.add(self._matrix[:self._size], self._student_ids, row)
+
+    def match(self, face_encoding, class_name=None, section=None):
+        """Return (student, distance) for the closest registered face
+
+        When ``class_name`` (and optionally ``section``) is given, only that
+        class partition is searched, exhaustively.
+        """
+        face_encoding = np.asarray(face_encoding, dtype=self.dtype)
+
+        with self._lock:
+            if class_name is None:
+                row, distance = self.matcher.search(self._matrix[:self._size], face_encoding)
+            else:
+                rows = self._scope_rows(class_name, section)
+                row, distance = ExactMatcher().search(self._matrix[rows], face_encoding)
+                if row is not None:
+                    row = int(rows[row])
+
+            if row is None:
+                return None, float('inf')
+            student = self._students[row]
+
+        return student, self._rerank(student, face_encoding, distance)
+
+    def match_many(self, face_encodings, class_name=None, section=None):
+        """Return a (student, distance) pair for each row of a (B x 128) probe matrix"""
+        face_encodings = np.asarray(face_encodings, dtype=self.dtype).reshape(-1, ENCODING_SIZE)
+
+        with self._lock:
+            if class_name is None:
+                rows, distances = self.matcher.search_many(self._matrix[:self._size], face_encodings)
+            else:
+                scope = self._scope_rows(class_name, section)
+                rows, distances = ExactMatcher().search_many(self._matrix[scope], face_encodings)
+                rows = [None if row is None else int(scope[row]) for row in rows]
+
+            students = [None if row is None else self._students[row] for row in rows]
+
+        return [
+            (None, float('inf')) if student is None
+            else (student, self._rerank(student, probe, float(distance)))
+            for student, distance, probe in zip(students, distances, face_encodings)
+        ]
+
+    def _rerank(self, student, face_encoding, distance):
+        """Closest template distance for ``student``; the centroid distance without templates
+
+        Runs outside the gallery lock since the loader may read the database.
+        """
+        if self.template_loader is None:
+            return distance
+        templates = self.template_loader(student['student_id'])
+        if templates is None:
+            return distance
+        return float(np.linalg.norm(templates - face_encoding, axis=1).min())
+
+    def _scope_rows(self, class_name, section):
+        """Gallery rows registered to a class, or to one section of it"""
+        if section is not None:
+            rows = self._partitions.get((class_name, section), [])
+        else:
+            rows = [
+                row for (partition_class, _), partition_rows in self._partitions.items()
+                if partition_class == class_name for row in partition_rows
+            ]
+        return np.asarray(rows, dtype=np.int64)
+
+    def _grow(self, required):
+        """Double the backing matrix until it holds ``required`` rows
+
+        Also copies an adopted read-only matrix before its first change. A
+        snapshot's spare rows put this off until the next start-up folds the
+        log into a new snapshot.
+        """
+        capacity = self._matrix.shape[0]
+        if required <= capacity and self._matrix.flags.writeable:
+            return
+
+        while capacity < required:
+            capacity = max(capacity * 2, 1)
+
+        matrix = np.empty((capacity, ENCODING_SIZE), dtype=self.dtype)
+        matrix[:self._size] = self._matrix[:self._size]
+        self._matrix = matrix
+
+    @staticmethod
+    def _partition_key(student):
+        return student['class'], student['section']
+
+    @staticmethod
+    def _metadata(student):
+        return {
+            'student_id': student['student_id'],
+            'name': student['name'],
+            'class': student['class'],
+            'section': student['section']
+        }
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Matcher backends for the resident face gallery
+Exact brute-force search and an IVF (k-means partitioned) ANN index
+"""
+
+import os
+import threading
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class ExactMatcher:
+    """Brute-force nearest neighbour over the whole gallery matrix"""
+
+    name = 'exact'
+
+    def build(self, encodings, student_ids):
+        """Nothing to precompute for exhaustive search"""
+
+    def add(self, encodings, student_ids, row):
+        """Nothing to update for exhaustive search"""
+
+    def search(self, encodings, face_encoding):
+        """Return (row, distance) of the closest encoding"""
+        if len(encodings) == 0:
+            return None, float('inf')
+
+        distances = np.linalg.norm(encodings - face_encoding, axis=1)
+        row = int(np.argmin(distances))
+        return row, float(distances[row])
+
+    def search_many(self, encodings, face_encodings):
+        """Return (rows, distances) for a (B x 128) batch as one matrix operation"""
+        if len(encodings) == 0:
+            return [None] * len(face_encodings), np.full(len(face_encodings), np.inf)
+
+        # ||p - e||^2 = ||p||^2 - 2p.e + ||e||^2, then recompute exact norms for the winners
+        scores = (encodings ** 2).sum(axis=1)[np.newaxis, :] - 2.0 * face_encodings @ encodings.T
+        rows = np.argmin(scores, axis=1)
+        distances = np.linalg.norm(encodings[rows] - face_encodings, axis=1)
+        return rows.tolist(), distances
+
+    def save(self):
+        """Exact search keeps no on-disk state"""
+
+
+class IVFMatcher:
+    """Inverted-file index: probe only the lists of the nearest k-means centroids
+
+    The centroids (about sqrt(N) lists unless ``nlist`` is fixed) are
+    retrained once the gallery has grown ``retrain_factor`` times past the
+    size they were trained on, so lists stay short as the school grows.
+    Retraining runs on a background thread, so the registration that
+    triggers it (and every check-in behind the gallery lock) does not wait
+    for k-means. Meanwhile the old centroids keep serving, and rows added
+    in the meantime are placed again when the new ones are swapped in.
+    Registrations only mark the index dirty; it is written at most once per
+    ``save_delay`` seconds on a timer thread, and by save() at shutdown.
+    """
+
+    name = 'ivf'
+
+    def __init__(self, index_path=None, nlist=None, nprobe=8, min_train_size=1024,
+                 train_iterations=15, retrain_factor=4, save_delay=30.0, seed=0):
+        self.index_path = index_path
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+        self.train_iterations = train_iterations
+        self.retrain_factor = retrain_factor
+        self.save_delay = save_delay
+        self.seed = seed
+        self._lock = threading.RLock()
+        self._save_lock = threading.Lock()
+        self._save_timer = None
+        # Background retrain in progress, rows changed since it started, and a counter that voids it
+        self._retraining = None
+        self._pending = {}
+        self._generation = 0
+        self._reset()
+
+    @property
+    def trained(self):
+        return self.centroids is not None
+
+    def build(self, encodings, student_ids):
+        """Assign every row to a list, reusing persisted centroids unless the gallery outgrew them"""
+        with self._lock:
+            self._reset()
+            self._generation += 1
+            self._retraining = None
+            self._pending = {}
+            stored = self._load_index()
+
+            if stored is not None and not self._outgrown(stored['trained_size'], len(encodings)):
+                centroids, trained_size = stored['centroids'], stored['trained_size']
+                assignments = np.array([
+                    stored['lists'].get(student_id, -1) for student_id in student_ids
+                ], dtype=np.int64)
+                missing = assignments < 0
+                if missing.any():
+                    assignments[missing] = self._nearest_centroid(encodings[missing], centroids)
+            elif len(encodings) >= self.min_train_size:
+                centroids, trained_size = self._train(encodings), len(encodings)
+                assignments = self._nearest_centroid(encodings, centroids)
+            else:
+                # Too few faces to partition; search falls back to brute force
+                return
+
+            self._install(centroids, trained_size, assignments, student_ids)
+
+    def add(self, encodings, student_ids, row):
+        """Place a newly registered (or re-registered) row into its list
+
+        Once the gallery has outgrown the centroids (or first reaches
+        ``min_train_size``), new ones are trained on a background thread;
+        that happens once per ``retrain_factor`` growth.
+        """
+        with self._lock:
+            if self.trained:
+                self._place(row, student_ids[row], encodings[row])
+                self._schedule_save()
+
+            if self._retraining is not None:
+                self._pending[row] = (student_ids[row], np.array(encodings[row]))
+            elif ((not self.trained or self._outgrown(self.trained_size, len(encodings)))
+                    and len(encodings) >= self.min_train_size):
+                if self.trained:
+                    logger.info(f"IVF index trained on {self.trained_size} encodings now serves "
+                                f"{len(encodings)}, retraining")
+                # ``encodings`` is a view of the gallery matrix: rows it already holds are only
+                # rewritten by later add() calls, which _pending places again after the swap
+                self._retraining = threading.Thread(
+                    target=self._retrain, args=(encodings, list(student_ids[:len(encodings)]), self._generation),
+                    name='ivf-retrain', daemon=True
+                )
+                self._retraining.start()
+
+    def wait_for_training(self, timeout=None):
+        """Block until a background retrain has been swapped in, e.g. in tests and benchmarks"""
+        thread = self._retraining
+        if thread is not None:
+            thread.join(timeout)
+
+    def _retrain(self, encodings, student_ids, generation):
+        """Train and assign without the lock, then swap the new lists in"""
+        try:
+            centroids = self._train(encodings)
+            assignments = self._nearest_centroid(encodings, centroids)
+        except Exception as e:
+            logger.error(f"Error retraining IVF index: {str(e)}")
+            with self._lock:
+                if generation == self._generation:
+                    self._retraining = None
+                    self._pending = {}
+            return
+
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._install(centroids, len(encodings), assignments, student_ids)
+            for row, (student_id, encoding) in self._pending.items():
+                self._place(row, student_id, encoding)
+            self._retraining = None
+            self._pending = {}
+
+    def _install(self, centroids, trained_size, assignments, student_ids):
+        """Adopt centroids and the list of every row (rows beyond ``assignments`` are placed later)"""
+        self._reset()
+        self.centroids = centroids
+        self.trained_size = trained_size
+        lists = [[] for _ in range(len(centroids))]
+        for row, list_id in enumerate(assignments.tolist()):
+            lists[list_id].append(row)
+            self._row_lists[row] = list_id
+            self._student_lists[student_ids[row]] = list_id
+        self._lists = [np.asarray(rows, dtype=np.int64) for rows in lists]
+        self._schedule_save()
+
+    def _place(self, row, student_id, encoding):
+        """Move one row into the list of its nearest centroid"""
+        list_id = int(self._nearest_centroid(encoding[np.newaxis, :])[0])
+        previous = self._row_lists.get(row)
+        if previous is not None:
+            self._lists[previous] = self._lists[previous][self._lists[previous] != row]
+        self._lists[list_id] = np.append(self._lists[list_id], row)
+        self._row_lists[row] = list_id
+        self._student_lists[student_id] = list_id
+
+    def search(self, encodings, face_encoding):
+        """Return (row, distance) of the closest encoding among the probed lists"""
+        with self._lock:
+            if len(encodings) == 0:
+                return None, float('inf')
+            if not self.trained:
+                return ExactMatcher().search(encodings, face_encoding)
+
+            centroid_distances = np.linalg.norm(self.centroids - face_encoding, axis=1)
+            nprobe = min(self.nprobe, len(self.centroids))
+            probed = np.argpartition(centroid_distances, nprobe - 1)[:nprobe]
+            candidates = np.concatenate([self._lists[list_id] for list_id in probed])
+
+        if len(candidates) == 0:
+            return None, float('inf')
+
+        distances = np.linalg.norm(encodings[candidates] - face_encoding, axis=1)
+        best = int(np.argmin(distances))
+        return int(candidates[best]), float(distances[best])
+
+    def search_many(self, encodings, face_encodings):
+        """Return (rows, distances) for a batch of probes"""
+        results = [self.search(encodings, face_encoding) for face_encoding in face_encodings]
+        return [row for row, _ in results], np.array([distance for _, distance in results])
+
+    def save(self):
+        """Persist centroids and list assignments next to the database, e.g. at shutdown
+
+        Only copying the assignments holds the lock; the file is written
+        without it, so matching carries on meanwhile.
+        """
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            if not self.index_path or not self.trained:
+                return
+            centroids = self.centroids
+            trained_size = self.trained_size
+            student_ids = np.array(list(self._student_lists.keys()), dtype=str)
+            list_ids = np.array(list(self._student_lists.values()), dtype=np.int64)
+
+        with self._save_lock:
+            tmp_path = f"{self.index_path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, centroids=centroids, student_ids=student_ids, list_ids=list_ids,
+                         trained_size=np.int64(trained_size))
+            os.replace(tmp_path, self.index_path)
+
+    def _schedule_save(self):
+        """Save after ``save_delay`` seconds, so a burst of registrations writes the index once"""
+        with self._lock:
+            if not self.index_path or self._save_timer is not None:
+                return
+            self._save_timer = threading.Timer(self.save_delay, self.save)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def _outgrown(self, trained_size, size):
+        return bool(self.retrain_factor) and size >= self.retrain_factor * trained_size
+
+    def _reset(self):
+        self.centroids = None
+        self.trained_size = 0
+        self._lists = []
+        self._row_lists = {}
+        self._student_lists = {}
+
+    def _nearest_centroid(self, encodings, centroids=None):
+        # ||x - c||^2 = ||x||^2 - 2x.c + ||c||^2; the ||x||^2 term does not change the argmin
+        centroids = self.centroids if centroids is None else centroids
+        scores = (centroids ** 2).sum(axis=1) - 2.0 * encodings @ centroids.T
+        return np.argmin(scores, axis=1)
+
+    def _train(self, encodings):
+        """Lloyd's k-means on a sample of the gallery"""
+        rng = np.random.default_rng(self.seed)
+        nlist = self.nlist or max(1, int(np.sqrt(len(encodings))))
+        sample_size = min(len(encodings), nlist * 256)
+        sample = encodings[rng.choice(len(encodings), sample_size, replace=False)]
+
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+        for _ in range(self.train_iterations):
+            labels = self._nearest_centroid(sample, centroids)
+            for list_id in range(nlist):
+                members = sample[labels == list_id]
+                if len(members):
+                    centroids[list_id] = members.mean(axis=0)
+
+        logger.info(f"IVF index trained with {nlist} lists on {sample_size} encodings")
+        return centroids
+
+    def _load_index(self):
+        if not self.index_path or not os.path.exists(self.index_path):
+            return None
+
+        try:
+            with np.load(self.index_path) as data:
+                return {
+                    'centroids': data['centroids'],
+                    'trained_size': int(data['trained_size']),
+                    'lists': dict(zip(data['student_ids'].tolist(), data['list_ids'].tolist()))
+                }
+        except Exception as e:
+            logger.error(f"Error loading IVF index from {self.index_path}: {str(e)}")
+            return None
+
+
+def create_matcher(backend, index_path=None, **options):
+    """Build a matcher backend by name ('exact' or 'ivf'); options only apply to 'ivf'"""
+    if backend == 'exact':
+        return ExactMatcher()
+    if backend == 'ivf':
+        return IVFMatcher(index_path=index_path, **options)
+    raise ValueError(f"Unknown matcher backend: {backend}")
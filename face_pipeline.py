@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Face detection and encoding pipeline for the AI attendance server
+Detects on a downscaled copy of the image and encodes at full resolution
+"""
+
+import io
+import time
+
+import numpy as np
+
+# Detector/encoder settings shared by the server, its workers and bulk enrolment
+DEFAULT_SETTINGS = {
+    'max_dimension': 800,
+    'model': 'hog',
+    'upsample': 1,
+    'num_jitters': 1
+}
+
+# (cv2, face_recognition), imported by the first call that needs them
+_vision_modules = None
+_cv2 = None
+
+
+def cv2_module():
+    """OpenCV alone, imported on first use
+
+    For image handling that needs no face models (video capture, trackers,
+    colour conversion), so e.g. the gate kiosk never loads dlib into the
+    server process.
+    """
+    global _cv2
+    if _cv2 is None:
+        import cv2
+        _cv2 = cv2
+    return _cv2
+
+
+def vision():
+    """The (cv2, face_recognition) modules, imported on first use
+
+    Importing face_recognition loads the dlib models, which takes seconds, so
+    processes that never detect or encode (health checks, report readers)
+    never pay for it.
+    """
+    global _vision_modules
+    if _vision_modules is None:
+        import face_recognition
+        _vision_modules = (cv2_module(), face_recognition)
+    return _vision_modules
+
+
+def warm_up(settings=DEFAULT_SETTINGS):
+    """Load the models and run the detector once on a blank image"""
+    encode_all_faces(np.zeros((64, 64, 3), dtype=np.uint8), settings)
+
+
+def load_image(image_source):
+    """Decode an image from a path, file object or in-memory bytes into a NumPy RGB array"""
+    if isinstance(image_source, (bytes, bytearray)):
+        image_source = io.BytesIO(image_source)
+    _, face_recognition = vision()
+    return face_recognition.load_image_file(image_source)
+
+
+def downscale(image, max_dimension):
+    """Shrink ``image`` so its longest side is at most ``max_dimension``
+
+    Returns (image, scale) where scale maps full-resolution pixels to the
+    returned image; 0 or None for ``max_dimension`` disables downscaling.
+    """
+    height, width = image.shape[:2]
+    longest = max(height, width)
+
+    if not max_dimension or longest <= max_dimension:
+        return image, 1.0
+
+    cv2 = cv2_module()
+    scale = max_dimension / float(longest)
+    size = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA), scale
+
+
+def detect_faces(image, max_dimension=800, model='hog', upsample=1):
+    """Return face boxes (top, right, bottom, left) in full-resolution pixels"""
+    _, face_recognition = vision()
+    small, scale = downscale(image, max_dimension)
+    locations = face_recognition.face_locations(
+        small, number_of_times_to_upsample=upsample, model=model
+    )
+
+    if scale == 1.0:
+        return locations
+
+    height, width = image.shape[:2]
+    return [
+        (
+            max(0, int(round(top / scale))),
+            min(width, int(round(right / scale))),
+            min(height, int(round(bottom / scale))),
+            max(0, int(round(left / scale)))
+        )
+        for top, right, bottom, left in locations
+    ]
+
+
+def largest_face(locations):
+    """The box with the largest area, or None"""
+    if not locations:
+        return None
+    return max(locations, key=lambda box: (box[2] - box[0]) * (box[1] - box[3]))
+
+
+def encode_faces(image, locations, num_jitters=1):
+    """Encode the given full-resolution boxes"""
+    if not locations:
+        return []
+    _, face_recognition = vision()
+    return face_recognition.face_encodings(image, locations, num_jitters=num_jitters)
+
+
+def encode_largest_face(image, settings=DEFAULT_SETTINGS, timings=None):
+    """Detect faces and encode only the largest (closest) one; None if there is no face
+
+    A ``timings`` dict receives the 'detect' and 'encode' durations in ms.
+    """
+    started = time.perf_counter()
+    face_location = largest_face(detect_faces(
+        image,
+        max_dimension=settings['max_dimension'],
+        model=settings['model'],
+        upsample=settings['upsample']
+    ))
+    detected = time.perf_counter()
+    if timings is not None:
+        timings['detect'] = (detected - started) * 1000
+    if face_location is None:
+        return None
+    encoding = encode_faces(image, [face_location], settings['num_jitters'])[0]
+    if timings is not None:
+        timings['encode'] = (time.perf_counter() - detected) * 1000
+    return encoding
+
+
+def encode_all_faces(image, settings=DEFAULT_SETTINGS, timings=None):
+    """Detect and encode every face; returns (locations, encodings)
+
+    A ``timings`` dict receives the 'detect' and 'encode' durations in ms.
+    """
+    started = time.perf_counter()
+    face_locations = detect_faces(
+        image,
+        max_dimension=settings['max_dimension'],
+        model=settings['model'],
+        upsample=settings['upsample']
+    )
+    detected = time.perf_counter()
+    encodings = encode_faces(image, face_locations, settings['num_jitters'])
+    if timings is not None:
+        timings['detect'] = (detected - started) * 1000
+        timings['encode'] = (time.perf_counter() - detected) * 1000
+    return face_locations, encodings
@@ -5,22 +5,39 @@ Server-side Python implementation with Flask API
 """
 
 import os
-import cv2
+import io
+import csv
 import numpy as np
-import face_recognition
 import json
-import sqlite3
 import base64
-import requests
-from datetime import datetime, timedelta
-from flask import Flask, request, jsonify, send_file
+from datetime import datetime
+from flask import Flask, request, jsonify
 from flask_cors import CORS
-import geopy.distance
-import hashlib
+import atexit
 import logging
+import functools
 from werkzeug.utils import secure_filename
 import threading
 import time
+from face_gallery import FaceGallery
+from gallery_store import GalleryStore
+from face_matchers import create_matcher
+from database import ConnectionPool
+import migrations
+import face_templates
+import attendance_reports
+import attendance_rollups
+from image_archive import ImageArchiver
+from recognition_engine import RecognitionEngine, RecognitionBusy
+from micro_batcher import MicroBatcher, BATCH_SIZE_BUCKETS
+from geofence import Geofence
+from attendance_cache import MarkedToday
+from pipeline_metrics import PipelineMetrics, histogram_samples, prometheus_family
+from sampling_profiler import SamplingProfiler
+from student_encodings import StudentEncodingCache
+from response_cache import ResponseCache, VersionCounters
+from encoding_cache import UploadEncodingCache
+from kiosk_video import KioskSession
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -32,195 +49,773 @@ CORS(app)
 # Configuration
 UPLOAD_FOLDER = 'face_data'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+MAX_UPLOAD_SIZE = 16 * 1024 * 1024  # Uploads are decoded in memory
+ARCHIVE_REGISTRATION_IMAGES = True  # Keep registration photos in UPLOAD_FOLDER
+ARCHIVE_CHECKIN_IMAGES = False  # Also keep every check-in / class photo (written in the background)
 SCHOOL_LOCATION = {
     'latitude': 28.6139,  # Delhi coordinates (can be changed to actual school location)
     'longitude': 77.2090,
     'radius_km': 0.5  # 500 meters radius
 }
 
+# Campuses where attendance may be marked; each needs latitude/longitude (the point
+# distances are reported from) and either radius_km or a polygon of (lat, lng) vertices
+CAMPUSES = [
+    dict(SCHOOL_LOCATION, name='Main campus'),
+]
+
+# Face detection settings
+DETECTION_MAX_DIMENSION = 800  # Longest side (px) used for detection; 0 = full resolution
+DETECTION_MODEL = 'hog'  # 'hog' (CPU) or 'cnn' (more accurate, needs a GPU to be fast)
+DETECTION_UPSAMPLE = 1  # Upsampling passes; raise to find smaller faces
+ENCODING_NUM_JITTERS = 1  # Re-samples per face when encoding; higher is slower and steadier
+REGISTRATION_NUM_JITTERS = 10  # Registration is rare, so its templates average more re-samples
+
+# Face templates (several encodings per student)
+TEMPLATE_REFRESH_DISTANCE = 0.4  # Check-ins this close to a student also become a template
+
+# Recognition engine: detection/encoding run on warm worker processes
+RECOGNITION_WORKERS = max(1, (os.cpu_count() or 2) - 1)  # 0 runs jobs inline on the request thread
+RECOGNITION_MAX_PENDING = RECOGNITION_WORKERS * 4  # Beyond this requests get 503 + Retry-After
+RECOGNITION_TIMEOUT = 10  # Seconds a request waits for its job
+WARM_UP_ON_START = True  # create_app() loads the models before serving; False defers it to the first recognition
+
+# 1:1 verification (/api/verify-face)
+VERIFY_CACHE_SIZE = 4096  # Students whose decoded templates are kept in memory (also used for reranking)
+
+# Encodings of recent uploads, so a retried or resubmitted photo skips detection and encoding
+ENCODING_CACHE_SIZE = 2048  # Uploads remembered; 0 disables the cache
+ENCODING_CACHE_MAX_BYTES = 16 * 1024 * 1024  # Memory cap of the cached encodings (image bytes are not kept)
+ENCODING_CACHE_TTL = 300  # Seconds a result is reused for the same bytes
+
+# Micro-batching of concurrent check-ins (gallery matching and attendance inserts)
+BATCH_WINDOW_MS = 10  # How long a batch waits for more requests after the first arrives
+BATCH_MAX_SIZE = 32  # A batch closes early once it holds this many requests
+
+# Attendance history pages and exports
+HISTORY_PAGE_SIZE = 30  # Records per history page unless ?limit= asks for another size
+HISTORY_MAX_PAGE_SIZE = 500
+EXPORT_CHUNK_SIZE = 1000  # Rows fetched per query while streaming an export
+
+# Read-endpoint caching (ETag / 304 and serialized responses kept in memory)
+RESPONSE_CACHE_SIZE = 1024  # Cached response bodies
+RESPONSE_CACHE_TTL = 30  # Seconds a body may be reused; bounds staleness after edits made outside the server
+HTTP_CACHE_MAX_AGE = 5  # Cache-Control max-age of attendance reads; afterwards clients revalidate
+SCHOOL_LOCATION_MAX_AGE = 3600  # Cache-Control max-age of the (static) campus configuration
+
+# Observability (/api/metrics is always on; the profiler is opt-in)
+PROFILER_ENABLED = False  # Allow /api/profiler/start to sample stacks at runtime, e.g. during the morning rush
+PROFILER_INTERVAL_MS = 10  # Default time between stack samples
+PROFILER_MAX_SECONDS = 300  # A profile stops by itself after this long
+
+# Gate kiosk: continuous recognition from one camera (see kiosk_video.py)
+KIOSK_SOURCE = None  # Camera index (e.g. 0), video file or stream URL started by create_app(); None = off
+KIOSK_LOCATION = None  # (latitude, longitude) of the gate; None uses SCHOOL_LOCATION
+KIOSK_DETECT_EVERY = 5  # Run the face detector on every Nth frame; trackers follow faces in between
+KIOSK_TRACKER = 'KCF'  # OpenCV tracker; KCF needs opencv-contrib-python (requirements.txt), else MIL is used
+KIOSK_MIN_FACE_SIZE = 80  # Faces are encoded once they are at least this many pixels tall
+KIOSK_RETRY_FRAMES = 15  # An unrecognized face is encoded again after this many frames...
+KIOSK_RETRY_SECONDS = 1.0  # ...or this many seconds, whichever comes first
+KIOSK_MAX_ATTEMPTS = 3  # Encodings per tracked face before it stays 'not_recognized'
+
+# Server settings
+SERVER_HOST = '0.0.0.0'
+SERVER_PORT = 5000
+SERVER_THREADS = 16  # Request threads of the production (waitress) server
+
+# Maximum face distance accepted as a match
+CONFIDENCE_THRESHOLD = 0.6
+
+# Database settings
+DATABASE_PATH = 'face_attendance.db'
+DB_POOL_SIZE = 8  # Connections shared by request threads
+
+# Face matching backend: 'exact' (brute force) or 'ivf' (approximate, for district-scale galleries)
+MATCHER_BACKEND = 'exact'
+ANN_INDEX_PATH = 'face_attendance.ivf.npz'  # Persisted next to face_attendance.db
+ANN_NPROBE = 8  # IVF lists searched per probe; higher is more accurate and slower
+
+# Gallery snapshot: every centroid in one memory-mapped matrix file, rebuilt from the database when stale
+GALLERY_STORE_PATH = 'face_gallery'  # Prefix of face_gallery.npy, .ids.json and .log
+GALLERY_STORE_DTYPE = 'float32'  # 'float16' halves the file again (widened to float32 when loaded)
+GALLERY_STORE_HEADROOM = 1024  # Spare snapshot rows for registrations between start-ups
+
 # Ensure upload folder exists
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_SIZE
+
+# Writes uploaded images to UPLOAD_FOLDER off the request path
+image_archiver = ImageArchiver(UPLOAD_FOLDER)
+
+# Connection checkout and write-lock waits
+database_metrics = PipelineMetrics('database')
+
+# Pooled WAL-mode connections shared by all routes
+db_pool = ConnectionPool(DATABASE_PATH, size=DB_POOL_SIZE, metrics=database_metrics)
+
+# Detection and encoding worker pool, started by create_app()
+recognition_engine = RecognitionEngine(
+    workers=RECOGNITION_WORKERS,
+    max_pending=RECOGNITION_MAX_PENDING,
+    timeout=RECOGNITION_TIMEOUT,
+    settings={
+        'max_dimension': DETECTION_MAX_DIMENSION,
+        'model': DETECTION_MODEL,
+        'upsample': DETECTION_UPSAMPLE,
+        'num_jitters': ENCODING_NUM_JITTERS
+    }
+)
+
+# Students already marked today, so repeat check-ins skip the face pipeline
+marked_today = MarkedToday(lambda date_iso: load_marked_today(date_iso))
+
+# Decoded encodings of recently verified students, for 1:1 checks
+student_encodings = StudentEncodingCache(
+    lambda student_id: load_student_encodings(student_id), max_entries=VERIFY_CACHE_SIZE
+)
+
+# Detection/encoding results of recent uploads, keyed by a hash of the bytes
+upload_encodings = UploadEncodingCache(
+    max_entries=ENCODING_CACHE_SIZE, max_bytes=ENCODING_CACHE_MAX_BYTES, ttl_seconds=ENCODING_CACHE_TTL
+)
+
+# Stage timings for the recognize-face and verify-face pipelines
+recognize_metrics = PipelineMetrics('recognize_face')
+verify_metrics = PipelineMetrics('verify_face')
+register_metrics = PipelineMetrics('register_face')
+gallery_metrics = PipelineMetrics('gallery')
+kiosk_metrics = PipelineMetrics('kiosk')
+
+# Stack sampler for flame graphs, toggled through /api/profiler when PROFILER_ENABLED
+profiler = SamplingProfiler(interval_ms=PROFILER_INTERVAL_MS, max_seconds=PROFILER_MAX_SECONDS)
+
+# Versions of the data behind each cached read, bumped on attendance writes and registrations
+data_versions = VersionCounters()
+response_cache = ResponseCache(max_entries=RESPONSE_CACHE_SIZE, ttl_seconds=RESPONSE_CACHE_TTL)
+
+# Gate kiosk session, started by start_kiosk()
+kiosk_session = None
+kiosk_lock = threading.Lock()
+
+# Campus boundaries checked on every check-in
+geofence = Geofence(CAMPUSES)
+
+# Micro-batchers shared by concurrent recognize-face requests (handlers are defined below)
+match_batcher = MicroBatcher(
+    lambda probes: match_probe_batch(probes),
+    max_batch_size=BATCH_MAX_SIZE, window_ms=BATCH_WINDOW_MS, name='match-batcher'
+)
+attendance_batcher = MicroBatcher(
+    lambda records: insert_attendance_batch(records),
+    max_batch_size=BATCH_MAX_SIZE, window_ms=BATCH_WINDOW_MS, name='attendance-batcher'
+)
+
+# Resident gallery of registered encodings, shared by all request threads
+face_gallery = FaceGallery(
+    matcher=create_matcher(MATCHER_BACKEND, index_path=ANN_INDEX_PATH, nprobe=ANN_NPROBE),
+    template_loader=lambda student_id: cached_templates(student_id)
+)
+# The IVF index is saved on a timer after registrations; write any pending changes at exit
+atexit.register(face_gallery.matcher.save)
+gallery_store = GalleryStore(GALLERY_STORE_PATH, dtype=GALLERY_STORE_DTYPE, headroom=GALLERY_STORE_HEADROOM)
+gallery_load_lock = threading.Lock()
+
+# Single-row attendance insert; UNIQUE(student_id, date) turns a repeat into a no-op
+ATTENDANCE_INSERT_SQL = '''
+    INSERT INTO attendance_records 
+    (student_id, date, time, status, confidence_score, 
+     location_lat, location_lng, distance_from_school, image_path)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (student_id, date) DO NOTHING
+'''
 
 # Database setup
 def init_database():
     """Initialize SQLite database for face recognition data"""
-    conn = sqlite3.connect('face_attendance.db')
-    cursor = conn.cursor()
-    
-    # Students table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS students (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            student_id TEXT UNIQUE NOT NULL,
-            name TEXT NOT NULL,
-            class TEXT NOT NULL,
-            section TEXT NOT NULL,
-            face_encoding BLOB,
-            face_image_path TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Attendance records table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS attendance_records (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            student_id TEXT NOT NULL,
-            date DATE NOT NULL,
-            time TIME NOT NULL,
-            status TEXT NOT NULL,
-            confidence_score REAL,
-            location_lat REAL,
-            location_lng REAL,
-            distance_from_school REAL,
-            image_path TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (student_id) REFERENCES students (student_id)
-        )
-    ''')
-    
-    # Face recognition sessions table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS recognition_sessions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            session_id TEXT UNIQUE NOT NULL,
-            student_id TEXT,
-            status TEXT NOT NULL,
-            confidence_score REAL,
-            location_verified BOOLEAN,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (student_id) REFERENCES students (student_id)
-        )
-    ''')
+    with db_pool.connection() as conn:
+        version = migrations.migrate(conn)
     
-    conn.commit()
-    conn.close()
-    logger.info("Database initialized successfully")
+    logger.info(f"Database initialized successfully (schema version {version})")
 
 def allowed_file(filename):
     """Check if file extension is allowed"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def calculate_distance(lat1, lon1, lat2, lon2):
-    """Calculate distance between two coordinates in kilometers"""
-    coords_1 = (lat1, lon1)
-    coords_2 = (lat2, lon2)
-    return geopy.distance.geodesic(coords_1, coords_2).kilometers
-
 def verify_location(student_lat, student_lng):
-    """Verify if student is within school premises"""
-    distance = calculate_distance(
-        student_lat, student_lng,
-        SCHOOL_LOCATION['latitude'], SCHOOL_LOCATION['longitude']
-    )
-    return distance <= SCHOOL_LOCATION['radius_km'], distance
+    """Verify if student is within a campus; returns (verified, distance_km, campus)"""
+    return geofence.check(student_lat, student_lng)
+
+def location_failed_response(distance, campus):
+    """400 response for a check-in made outside every campus"""
+    if campus.get('radius_km') is not None:
+        limit = f'within {campus["radius_km"]} km'
+    else:
+        limit = f'inside the {campus.get("name", "campus")} boundary'
+    return jsonify({
+        'error': 'Location verification failed',
+        'message': f'You are {distance:.2f} km away from school. Please be {limit} to mark attendance.',
+        'distance': distance
+    }), 400
+
+def encode_face_from_image(image_source, num_jitters=None, metrics=None):
+    """Extract face encoding from image (a path or the uploaded bytes) on the recognition engine
+
+    Uploaded bytes seen recently reuse their earlier result (see upload_encodings).
+    """
+    def compute():
+        return recognition_engine.encode_face(image_source, num_jitters=num_jitters, metrics=metrics)
+    
+    if not isinstance(image_source, (bytes, bytearray)):
+        return compute()
+    kind = f"face:{num_jitters if num_jitters is not None else ENCODING_NUM_JITTERS}"
+    return upload_encodings.get_or_compute(image_source, kind, compute)
+
+def encode_faces_from_image(image_source, metrics=None):
+    """Detect every face in an image (a path or the uploaded bytes) and encode them in one pass"""
+    def compute():
+        return recognition_engine.encode_faces(image_source, metrics=metrics)
+    
+    if not isinstance(image_source, (bytes, bytearray)):
+        return compute()
+    return upload_encodings.get_or_compute(image_source, 'faces', compute)
+
+def already_marked_response():
+    """400 response for a student who has already been marked today"""
+    return jsonify({
+        'error': 'Attendance already marked',
+        'message': 'You have already marked attendance for today'
+    }), 400
+
+def busy_response(error):
+    """503 telling the client when to retry, used when the recognition queue is full"""
+    response = jsonify({
+        'error': 'Server busy',
+        'message': 'Too many recognition requests, please retry shortly'
+    })
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 503
+
+def class_version(class_name, section):
+    """Version counter name of a class section's attendance and roster"""
+    return f"class:{class_name}/{section}"
+
+def attendance_changed(students):
+    """Invalidate cached reads covering these students after their attendance or registration changed"""
+    data_versions.bump('attendance', *(
+        name for student in students
+        for name in (f"student:{student['student_id']}", class_version(student['class'], student['section']))
+    ))
+
+def cached_read(versions, max_age=HTTP_CACHE_MAX_AGE, visibility='private'):
+    """Route decorator serving repeat reads from the response cache
+
+    ``versions(**view_args)`` returns everything besides the request URL the
+    response depends on - data_versions counters and e.g. today's date - and
+    is evaluated before the view runs. A matching If-None-Match gets an
+    empty 304 and a cached body is served without running the view; only
+    200 responses are cached.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(**view_args):
+            etag = response_cache.etag(request.full_path, versions(**view_args))
+            
+            if etag in request.if_none_match:
+                response_cache.record_not_modified()
+                response = app.response_class(status=304)
+            else:
+                body = response_cache.get(etag)
+                if body is not None:
+                    response = app.response_class(body, mimetype='application/json')
+                else:
+                    response = app.make_response(view(**view_args))
+                    if response.status_code != 200:
+                        return response
+                    response_cache.put(etag, response.get_data())
+            
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = f'{visibility}, max-age={max_age}'
+            return response
+        return wrapper
+    return decorator
 
-def encode_face_from_image(image_path):
-    """Extract face encoding from image"""
+def encode_cursor(values):
+    """Opaque pagination cursor for a keyset tuple"""
+    return base64.urlsafe_b64encode(json.dumps(list(values)).encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor, types):
+    """Keyset tuple of a cursor from encode_cursor(); ValueError unless it holds values of ``types``"""
+    values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    if not isinstance(values, list) or len(values) != len(types) or not all(
+            isinstance(value, value_type) for value, value_type in zip(values, types)):
+        raise ValueError('Malformed cursor')
+    return tuple(values)
+
+def requested_classes():
+    """Classes named by ?class=9&class=10 or ?class=9,10; empty means the whole school"""
+    return [
+        class_name for value in request.args.getlist('class')
+        for class_name in value.split(',') if class_name
+    ]
+
+def export_pages(date_from, date_to, classes, section):
+    """Pages of matching attendance rows, one short keyset query each, so memory stays flat"""
+    after = None
+    while True:
+        with db_pool.connection() as conn:
+            rows = attendance_reports.export_page(
+                conn, EXPORT_CHUNK_SIZE, after, date_from, date_to, classes, section
+            )
+        if rows:
+            yield rows
+        if len(rows) < EXPORT_CHUNK_SIZE:
+            return
+        after = (rows[-1][5], rows[-1][0])
+
+def ndjson_export(pages):
+    """One JSON object per line"""
+    for rows in pages:
+        yield ''.join(
+            json.dumps(dict(zip(attendance_reports.EXPORT_COLUMNS, row))) + '\n' for row in rows
+        )
+
+def csv_export(pages):
+    """Header row, then one line per record"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(attendance_reports.EXPORT_COLUMNS)
+    for rows in pages:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def logged_stream(chunks, description):
+    """Pass a streamed body through, logging an error that cuts it short"""
     try:
-        image = face_recognition.load_image_file(image_path)
-        face_encodings = face_recognition.face_encodings(image)
+        yield from chunks
+    except Exception as e:
+        logger.error(f"Error streaming {description}: {str(e)}")
+        raise
+
+def save_face_encoding(student_id, face_encoding, image_path, source='registration', confidence=None):
+    """Add a face template for a registered student; returns (centroid, watermark) or None"""
+    with db_pool.transaction() as conn:
+        if image_path:
+            conn.execute(
+                'UPDATE students SET face_image_path = ? WHERE student_id = ?', (image_path, student_id)
+            )
         
-        if len(face_encodings) > 0:
-            return face_encodings[0]
-        else:
+        # Check-in templates are only kept if they add a view unlike the stored ones
+        min_novelty = face_templates.MIN_TEMPLATE_NOVELTY if source == 'checkin' else None
+        added = face_templates.add_template(
+            conn, student_id, face_encoding, source, confidence, min_novelty=min_novelty
+        )
+        if added is None:
             return None
+        return added[0], face_templates.watermark(conn)
+
+def publish_centroid(student, centroid, watermark):
+    """Apply a student's new centroid to the gallery, its snapshot log and the template cache"""
+    get_face_gallery().upsert(
+        student['student_id'], student['name'], student['class'], student['section'], centroid
+    )
+    gallery_store.append(student['student_id'], centroid, watermark)
+    student_encodings.invalidate(student['student_id'])
+
+def load_all_face_encodings():
+    """Load all face encodings from database"""
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT student_id, name, class, section, face_encoding 
+            FROM students 
+            WHERE face_encoding IS NOT NULL
+        ''')
+        
+        students = []
+        for row in cursor.fetchall():
+            student_id, name, class_name, section, encoding_blob = row
+            if encoding_blob:
+                face_encoding = np.frombuffer(encoding_blob, dtype=np.float64)
+                students.append({
+                    'student_id': student_id,
+                    'name': name,
+                    'class': class_name,
+                    'section': section,
+                    'face_encoding': face_encoding
+                })
+        
+    return students
+
+def refresh_templates(student, face_encoding, confidence_score):
+    """Store a confident check-in as a template and update the gallery; errors are only logged"""
+    try:
+        refreshed = save_face_encoding(
+            student['student_id'], face_encoding, None, source='checkin', confidence=confidence_score
+        )
+        if refreshed is not None:
+            publish_centroid(student, *refreshed)
     except Exception as e:
-        logger.error(f"Error encoding face from {image_path}: {str(e)}")
-        return None
+        logger.error(f"Error refreshing templates for {student['student_id']}: {str(e)}")
 
-def save_face_encoding(student_id, face_encoding, image_path):
-    """Save face encoding to database"""
-    conn = sqlite3.connect('face_attendance.db')
-    cursor = conn.cursor()
+def match_probe_batch(probes):
+    """Match a micro-batch of (encoding, class, section) probes against the gallery
+
+    Returns (student, distance, scope) per probe. Probes sharing a scope are
+    matched as one matrix operation; scoped misses fall back to one
+    school-wide matrix operation.
+    """
+    gallery = get_face_gallery()
+    results = [None] * len(probes)
+    scopes = {}
+    
+    for index, (_, scope_class, scope_section) in enumerate(probes):
+        scopes.setdefault((scope_class, scope_section) if scope_class else None, []).append(index)
     
-    # Convert numpy array to binary
-    encoding_blob = face_encoding.tobytes()
+    school_wide = scopes.pop(None, [])
     
-    cursor.execute('''
-        INSERT OR REPLACE INTO students 
-        (student_id, face_encoding, face_image_path)
-        VALUES (?, ?, ?)
-    ''', (student_id, encoding_blob, image_path))
+    for (scope_class, scope_section), indices in scopes.items():
+        matches = gallery.match_many(
+            [probes[index][0] for index in indices], class_name=scope_class, section=scope_section
+        )
+        for index, (student, face_distance) in zip(indices, matches):
+            if face_distance <= CONFIDENCE_THRESHOLD:
+                results[index] = (student, face_distance, 'class')
+            else:
+                school_wide.append(index)
     
-    conn.commit()
-    conn.close()
+    if school_wide:
+        matches = gallery.match_many([probes[index][0] for index in school_wide])
+        for index, (student, face_distance) in zip(school_wide, matches):
+            results[index] = (student, face_distance, 'school')
+    
+    return results
 
-def load_all_face_encodings():
-    """Load all face encodings from database"""
-    conn = sqlite3.connect('face_attendance.db')
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT student_id, name, class, section, face_encoding 
-        FROM students 
-        WHERE face_encoding IS NOT NULL
-    ''')
-    
-    students = []
-    for row in cursor.fetchall():
-        student_id, name, class_name, section, encoding_blob = row
-        if encoding_blob:
-            face_encoding = np.frombuffer(encoding_blob, dtype=np.float64)
-            students.append({
-                'student_id': student_id,
-                'name': name,
-                'class': class_name,
-                'section': section,
-                'face_encoding': face_encoding
-            })
+def insert_attendance_records(conn, records):
+    """Insert attendance rows and fold the new ones into the rollups, in the caller's transaction
+
+    Returns True per row inserted.
+    """
+    inserted = [conn.execute(ATTENDANCE_INSERT_SQL, record).rowcount == 1 for record in records]
+    attendance_rollups.apply(conn, [
+        (record[0], record[1], record[3]) for record, added in zip(records, inserted) if added
+    ])
+    return inserted
+
+def record_attendance(student, face_distance, face_encoding, latitude, longitude, distance, metrics,
+                      now=None, image_path=None):
+    """Mark a recognized student present; shared by check-ins and the gate kiosk
+
+    Checks the "marked today" set, inserts through the attendance micro-batcher,
+    invalidates cached reads and keeps a confident face as an extra template.
+    Returns False if the student was already marked today.
+    """
+    now = now or datetime.now()
+    today = now.date().isoformat()
+    confidence_score = (1 - face_distance) * 100
     
-    conn.close()
-    return students
+    with metrics.stage('marked_today'):
+        if marked_today.contains(student['student_id'], today):
+            return False
+    
+    # Committed in one transaction with concurrent check-ins
+    with metrics.stage('record'):
+        inserted = attendance_batcher.run((
+            student['student_id'], today, now.time().isoformat(), 'present',
+            confidence_score, latitude, longitude, distance, image_path
+        ))
+        marked_today.add([student['student_id']], today)
+    
+    if not inserted:
+        return False
+    
+    attendance_changed([student])
+    
+    # A confident check-in becomes an extra template (e.g. a new hairstyle or lighting)
+    if face_distance <= TEMPLATE_REFRESH_DISTANCE:
+        with metrics.stage('template_refresh'):
+            refresh_templates(student, face_encoding, confidence_score)
+    
+    return True
 
-@app.route('/api/register-face', methods=['POST'])
-def register_face():
-    """Register a new student's face"""
-    try:
-        if 'image' not in request.files:
-            return jsonify({'error': 'No image file provided'}), 400
+def insert_attendance_batch(records):
+    """Insert a micro-batch of attendance rows in one transaction; True per row inserted"""
+    with db_pool.transaction() as conn:
+        return insert_attendance_records(conn, records)
+
+def load_student_encodings(student_id):
+    """(student, templates) for one registered student, or None"""
+    with db_pool.connection() as conn:
+        row = conn.execute('''
+            SELECT student_id, name, class, section, face_encoding 
+            FROM students 
+            WHERE student_id = ? AND face_encoding IS NOT NULL
+        ''', (student_id,)).fetchone()
         
-        file = request.files['image']
-        if file.filename == '':
-            return jsonify({'error': 'No file selected'}), 400
+        if row is None:
+            return None
         
-        if not allowed_file(file.filename):
-            return jsonify({'error': 'Invalid file type'}), 400
+        templates = face_templates.load_templates(conn, student_id).get(student_id)
+    
+    student_id, name, class_name, section, encoding_blob = row
+    student = {'student_id': student_id, 'name': name, 'class': class_name, 'section': section}
+    if templates is None:
+        templates = np.frombuffer(encoding_blob, dtype=np.float64).reshape(1, -1)
+    return student, templates
+
+def verify_claimed_face(entry, face_encoding):
+    """Compare a probe with a student's cached encodings; returns (student, distance)"""
+    student, encodings = entry
+    return student, float(np.linalg.norm(encodings - face_encoding, axis=1).min())
+
+def cached_templates(student_id):
+    """A student's templates from the verification cache, for the gallery's rerank"""
+    entry = student_encodings.get(student_id)
+    return None if entry is None else entry[1]
+
+def load_marked_today(date_iso):
+    """Student IDs with an attendance record on ``date_iso``"""
+    with db_pool.connection() as conn:
+        cursor = conn.execute('SELECT student_id FROM attendance_records WHERE date = ?', (date_iso,))
+        return [row[0] for row in cursor.fetchall()]
+
+def load_face_gallery():
+    """Map the gallery snapshot, first rebuilding it from the database if stale or folding in its log"""
+    # Other server processes may append to the log or fold it while this one reads it
+    with gallery_store.lock():
+        with db_pool.connection() as conn:
+            watermark = face_templates.watermark(conn)
+            students = {
+                row[0]: {'student_id': row[0], 'name': row[1], 'class': row[2], 'section': row[3]}
+                for row in conn.execute('''
+                    SELECT student_id, name, class, section FROM students 
+                    WHERE face_encoding IS NOT NULL
+                ''')
+            }
         
-        # Get student data
-        student_id = request.form.get('student_id')
-        name = request.form.get('name')
-        class_name = request.form.get('class')
-        section = request.form.get('section')
+        snapshot = gallery_store.load()
+        rebuild = snapshot is None
         
-        if not all([student_id, name, class_name, section]):
-            return jsonify({'error': 'Missing required student information'}), 400
+        if snapshot is None:
+            logger.info("No gallery snapshot found, building it from the database")
+        else:
+            student_ids, matrix, snapshot_watermark, log_records = snapshot
+            logged_ids = [record[0] for record in log_records]
+            
+            if snapshot_watermark != watermark or set(student_ids) | set(logged_ids) != set(students):
+                logger.info("Gallery snapshot is out of date, rebuilding it from the database")
+                rebuild = True
+            elif log_records:
+                # Fold the log into a new snapshot so every process maps one file
+                rows = {student_id: row for row, student_id in enumerate(student_ids)}
+                student_ids = list(student_ids)
+                combined = np.empty((len(rows.keys() | set(logged_ids)), matrix.shape[1]), dtype=np.float32)
+                combined[:len(student_ids)] = matrix[:len(student_ids)]
+                for student_id, encoding, _ in log_records:
+                    if student_id not in rows:
+                        rows[student_id] = len(student_ids)
+                        student_ids.append(student_id)
+                    combined[rows[student_id]] = encoding
+                snapshot = matrix = None
+                gallery_store.save(student_ids, combined, watermark)
         
-        # Save uploaded file
-        filename = secure_filename(f"{student_id}_{file.filename}")
-        filepath = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(filepath)
+        # Drop the old mapping before the snapshot file is replaced
+        snapshot = matrix = None
         
-        # Extract face encoding
-        face_encoding = encode_face_from_image(filepath)
+        if rebuild:
+            encodings = load_all_face_encodings()
+            gallery_store.save(
+                [student['student_id'] for student in encodings],
+                np.array([student['face_encoding'] for student in encodings]).reshape(-1, 128),
+                watermark
+            )
+        
+        student_ids, matrix, _, _ = gallery_store.load()
+        face_gallery.load_matrix(student_ids, matrix, students)
+
+def apply_gallery_changes():
+    """Apply centroids that other server processes logged since this one loaded the snapshot"""
+    records = gallery_store.changes()
+    if records is None:
+        logger.info("Gallery snapshot was replaced by another process, reloading it")
+        with gallery_metrics.stage('load'):
+            load_face_gallery()
+        return
+    if not records:
+        return
+    
+    student_ids = list({record[0] for record in records})
+    with db_pool.connection() as conn:
+        students = {
+            row[0]: row
+            for row in conn.execute(
+                f"SELECT student_id, name, class, section FROM students "
+                f"WHERE student_id IN ({','.join('?' * len(student_ids))})",
+                student_ids
+            )
+        }
+    for student_id, encoding, _ in records:
+        if student_id in students:
+            face_gallery.upsert(*students[student_id], encoding)
+        student_encodings.invalidate(student_id)
+
+def get_face_gallery():
+    """Return the resident gallery, loading it from its snapshot on first use
+
+    Later calls pick up registrations other server processes appended to
+    the snapshot log; checking for them costs two stat() calls.
+    """
+    if not face_gallery.loaded or gallery_store.changed():
+        with gallery_load_lock:
+            if not face_gallery.loaded:
+                with gallery_metrics.stage('load'):
+                    load_face_gallery()
+                logger.info(f"Face gallery loaded with {len(face_gallery)} encodings")
+            elif gallery_store.changed():
+                apply_gallery_changes()
+    return face_gallery
+
+def kiosk_identify(latitude, longitude, distance, encodings):
+    """Match faces newly tracked by the gate kiosk and mark them present; (status, student) per face"""
+    with kiosk_metrics.stage('match'):
+        matches = match_probe_batch([(encoding, None, None) for encoding in encodings])
+    
+    results = []
+    for encoding, (student, face_distance, _) in zip(encodings, matches):
+        if face_distance > CONFIDENCE_THRESHOLD:
+            status, student = 'not_recognized', None
+        elif record_attendance(student, face_distance, encoding, latitude, longitude, distance, kiosk_metrics):
+            status = 'marked'
+            logger.info(f"Kiosk marked attendance for student {student['student_id']}")
+        else:
+            status = 'already_marked'
+        kiosk_metrics.outcome(status)
+        results.append((status, student))
+    return results
+
+def start_kiosk(source, detect_every=None, tracker=None, background=True):
+    """Start the gate kiosk on a camera or video ``source``
+
+    With ``background=False`` the kiosk runs on the calling thread until the
+    source ends. Raises ValueError if the kiosk location is off campus and
+    RuntimeError if a kiosk is already running.
+    """
+    global kiosk_session
+    
+    if KIOSK_LOCATION:
+        latitude, longitude = KIOSK_LOCATION
+    else:
+        latitude, longitude = SCHOOL_LOCATION['latitude'], SCHOOL_LOCATION['longitude']
+    location_verified, distance, _ = verify_location(latitude, longitude)
+    if not location_verified:
+        raise ValueError(f"Kiosk location is {distance:.2f} km away from school")
+    
+    with kiosk_lock:
+        if kiosk_session is not None and kiosk_session.running:
+            raise RuntimeError('Kiosk is already running')
+        kiosk_session = KioskSession(
+            source, functools.partial(kiosk_identify, latitude, longitude, distance),
+            detect_every=detect_every or KIOSK_DETECT_EVERY,
+            tracker=tracker or KIOSK_TRACKER,
+            min_face_size=KIOSK_MIN_FACE_SIZE,
+            retry_frames=KIOSK_RETRY_FRAMES,
+            retry_seconds=KIOSK_RETRY_SECONDS,
+            max_attempts=KIOSK_MAX_ATTEMPTS,
+            engine=recognition_engine,
+            metrics=kiosk_metrics
+        )
+        session = kiosk_session
+    
+    name = repr(source) if isinstance(source, (int, str)) else 'in-memory frames'
+    logger.info(f"Gate kiosk started on {name}, detecting every {session.detect_every} frames")
+    if background:
+        session.start()
+    else:
+        session.run()
+    return session
+
+@app.route('/api/register-face', methods=['POST'])
+def register_face():
+    """Register a new student's face"""
+    metrics = register_metrics
+    try:
+        with metrics.stage('validate'):
+            if 'image' not in request.files:
+                metrics.outcome('invalid_request')
+                return jsonify({'error': 'No image file provided'}), 400
+            
+            file = request.files['image']
+            if file.filename == '':
+                metrics.outcome('invalid_request')
+                return jsonify({'error': 'No file selected'}), 400
+            
+            if not allowed_file(file.filename):
+                metrics.outcome('invalid_request')
+                return jsonify({'error': 'Invalid file type'}), 400
+            
+            # Get student data
+            student_id = request.form.get('student_id')
+            name = request.form.get('name')
+            class_name = request.form.get('class')
+            section = request.form.get('section')
+            
+            if not all([student_id, name, class_name, section]):
+                metrics.outcome('invalid_request')
+                return jsonify({'error': 'Missing required student information'}), 400
+        
+        # Decode straight from the uploaded bytes
+        with metrics.stage('upload_read'):
+            image_bytes = file.read()
+        
+        # Extract face encoding, averaging extra re-samples for a steadier template
+        with metrics.stage('face_pipeline'):
+            face_encoding = encode_face_from_image(
+                image_bytes, num_jitters=REGISTRATION_NUM_JITTERS, metrics=metrics
+            )
         
         if face_encoding is None:
-            os.remove(filepath)  # Clean up file
+            metrics.outcome('no_face')
             return jsonify({'error': 'No face detected in image'}), 400
         
-        # Save to database
-        conn = sqlite3.connect('face_attendance.db')
-        cursor = conn.cursor()
+        # Archive the registration photo in the background
+        filepath = None
+        if ARCHIVE_REGISTRATION_IMAGES:
+            filepath = image_archiver.archive(secure_filename(f"{student_id}_{file.filename}"), image_bytes)
         
-        cursor.execute('''
-            INSERT OR REPLACE INTO students 
-            (student_id, name, class, section, face_encoding, face_image_path)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (student_id, name, class_name, section, face_encoding.tobytes(), filepath))
+        # Save to database; registering again adds a template instead of replacing the face
+        with metrics.stage('db_write'), db_pool.transaction() as conn:
+            # A re-registration may move the student; the old class's cached reads change too
+            previous = conn.execute(
+                'SELECT class, section FROM students WHERE student_id = ?', (student_id,)
+            ).fetchone()
+            conn.execute('''
+                INSERT INTO students 
+                (student_id, name, class, section, face_image_path)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (student_id) DO UPDATE SET
+                    name = excluded.name,
+                    class = excluded.class,
+                    section = excluded.section,
+                    face_image_path = COALESCE(excluded.face_image_path, face_image_path)
+            ''', (student_id, name, class_name, section, filepath))
+            
+            centroid, _ = face_templates.add_template(conn, student_id, face_encoding, 'registration')
+            watermark = face_templates.watermark(conn)
         
-        conn.commit()
-        conn.close()
+        # Keep the resident gallery, its snapshot, the verification cache and cached reads in step with the database
+        with metrics.stage('publish'):
+            student = {'student_id': student_id, 'name': name, 'class': class_name, 'section': section}
+            publish_centroid(student, centroid, watermark)
+            changed = [student]
+            if previous is not None and tuple(previous) != (class_name, section):
+                changed.append({'student_id': student_id, 'class': previous[0], 'section': previous[1]})
+            attendance_changed(changed)
         
+        metrics.outcome('registered')
         logger.info(f"Face registered for student {student_id}")
         return jsonify({
             'success': True,
@@ -228,72 +823,107 @@ def register_face():
             'student_id': student_id
         })
         
+    except RecognitionBusy as e:
+        metrics.outcome('busy')
+        return busy_response(e)
     except Exception as e:
+        metrics.outcome('error')
         logger.error(f"Error registering face: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
-@app.route('/api/recognize-face', methods=['POST'])
-def recognize_face():
-    """Recognize face and mark attendance"""
+def mark_attendance(claimed_id, metrics):
+    """Mark attendance from an uploaded face; shared by recognize-face and verify-face
+
+    Stages run cheapest first and stop at the first rejection: request
+    validation, location, the in-memory "marked today" set (when a student_id
+    is claimed), face encoding, then a 1:1 verify against the claimed
+    student or a 1:N gallery match, and finally the insert.
+    """
     try:
-        if 'image' not in request.files:
-            return jsonify({'error': 'No image file provided'}), 400
-        
-        file = request.files['image']
-        if file.filename == '':
-            return jsonify({'error': 'No file selected'}), 400
-        
-        # Get location data
-        student_lat = float(request.form.get('latitude', 0))
-        student_lng = float(request.form.get('longitude', 0))
+        with metrics.stage('validate'):
+            if 'image' not in request.files:
+                metrics.outcome('invalid_request')
+                return jsonify({'error': 'No image file provided'}), 400
+            
+            file = request.files['image']
+            if file.filename == '':
+                metrics.outcome('invalid_request')
+                return jsonify({'error': 'No file selected'}), 400
+            
+            if not allowed_file(file.filename):
+                metrics.outcome('invalid_request')
+                return jsonify({'error': 'Invalid file type'}), 400
+            
+            # Get location data
+            try:
+                student_lat = float(request.form.get('latitude', 0))
+                student_lng = float(request.form.get('longitude', 0))
+            except ValueError:
+                metrics.outcome('invalid_request')
+                return jsonify({'error': 'Invalid latitude or longitude'}), 400
+            
+            # Optional class/section scope, e.g. when a faculty session is open for 10-A
+            scope_class = request.form.get('class') or None
+            scope_section = request.form.get('section') or None
+            
+            if claimed_id:
+                claimed_entry = student_encodings.get(claimed_id)
+                
+                if claimed_entry is None:
+                    metrics.outcome('invalid_request')
+                    return jsonify({'error': 'Student not registered'}), 400
+            elif len(get_face_gallery()) == 0:
+                metrics.outcome('invalid_request')
+                return jsonify({'error': 'No registered faces found'}), 400
         
         # Verify location
-        location_verified, distance = verify_location(student_lat, student_lng)
+        with metrics.stage('location'):
+            location_verified, distance, campus = verify_location(student_lat, student_lng)
         
         if not location_verified:
-            return jsonify({
-                'error': 'Location verification failed',
-                'message': f'You are {distance:.2f} km away from school. Please be within {SCHOOL_LOCATION["radius_km"]} km to mark attendance.',
-                'distance': distance
-            }), 400
-        
-        # Save uploaded image temporarily
-        temp_filename = f"temp_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg"
-        temp_filepath = os.path.join(UPLOAD_FOLDER, temp_filename)
-        file.save(temp_filepath)
+            metrics.outcome('outside_campus')
+            return location_failed_response(distance, campus)
         
-        # Extract face encoding from uploaded image
-        unknown_face_encoding = encode_face_from_image(temp_filepath)
+        now = datetime.now()
+        today = now.date()
         
-        if unknown_face_encoding is None:
-            os.remove(temp_filepath)
-            return jsonify({'error': 'No face detected in image'}), 400
+        if claimed_id:
+            with metrics.stage('marked_today'):
+                claimed_marked = marked_today.contains(claimed_id, today.isoformat())
+            if claimed_marked:
+                metrics.outcome('already_marked_before_encoding')
+                return already_marked_response()
         
-        # Load all registered faces
-        known_students = load_all_face_encodings()
+        # Extract face encoding straight from the uploaded bytes
+        with metrics.stage('upload_read'):
+            image_bytes = file.read()
         
-        if not known_students:
-            os.remove(temp_filepath)
-            return jsonify({'error': 'No registered faces found'}), 400
+        # The engine also records its decode/detect/encode/engine_queue stages
+        with metrics.stage('face_pipeline'):
+            unknown_face_encoding = encode_face_from_image(image_bytes, metrics=metrics)
         
-        # Compare faces
-        best_match = None
-        best_distance = float('inf')
+        if unknown_face_encoding is None:
+            metrics.outcome('no_face')
+            return jsonify({'error': 'No face detected in image'}), 400
         
-        for student in known_students:
-            face_distance = face_recognition.face_distance(
-                [student['face_encoding']], 
-                unknown_face_encoding
-            )[0]
-            
-            if face_distance < best_distance:
-                best_distance = face_distance
-                best_match = student
+        with metrics.stage('match'):
+            if claimed_id:
+                best_match, best_distance = verify_claimed_face(claimed_entry, unknown_face_encoding)
+                match_scope = 'claimed'
+            else:
+                # Matched together with concurrent check-ins; scoped misses fall back to the whole school
+                best_match, best_distance, match_scope = match_batcher.run(
+                    (unknown_face_encoding, scope_class, scope_section)
+                )
         
         # Check if match is confident enough (threshold: 0.6)
-        confidence_threshold = 0.6
-        if best_distance > confidence_threshold:
-            os.remove(temp_filepath)
+        if best_distance > CONFIDENCE_THRESHOLD:
+            metrics.outcome('not_recognized')
+            if claimed_id:
+                return jsonify({
+                    'error': 'Face not recognized',
+                    'message': 'Face does not match the registered face for this student'
+                }), 400
             return jsonify({
                 'error': 'Face not recognized',
                 'message': 'No matching face found in the database'
@@ -302,39 +932,22 @@ def recognize_face():
         # Calculate confidence score
         confidence_score = (1 - best_distance) * 100
         
-        # Check if attendance already marked today
-        today = datetime.now().date()
-        conn = sqlite3.connect('face_attendance.db')
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT id FROM attendance_records 
-            WHERE student_id = ? AND date = ?
-        ''', (best_match['student_id'], today))
+        # Queue the image before the record names it; archive() returns None if it had to drop it
+        image_path = None
+        if ARCHIVE_CHECKIN_IMAGES and not marked_today.contains(best_match['student_id'], today.isoformat()):
+            image_filename = f"{best_match['student_id']}_{now.strftime('%Y%m%d_%H%M%S')}.jpg"
+            image_path = image_archiver.archive(image_filename, image_bytes)
         
-        if cursor.fetchone():
-            conn.close()
-            os.remove(temp_filepath)
-            return jsonify({
-                'error': 'Attendance already marked',
-                'message': 'You have already marked attendance for today'
-            }), 400
-        
-        # Save attendance record
-        now = datetime.now()
-        cursor.execute('''
-            INSERT INTO attendance_records 
-            (student_id, date, time, status, confidence_score, 
-             location_lat, location_lng, distance_from_school, image_path)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            best_match['student_id'], today, now.time(), 'present',
-            confidence_score, student_lat, student_lng, distance, temp_filepath
-        ))
-        
-        conn.commit()
-        conn.close()
+        # Check if attendance already marked today, then save the record
+        marked = record_attendance(
+            best_match, best_distance, unknown_face_encoding, student_lat, student_lng, distance, metrics,
+            now=now, image_path=image_path
+        )
+        if not marked:
+            metrics.outcome('already_marked')
+            return already_marked_response()
         
+        metrics.outcome('marked')
         logger.info(f"Attendance marked for student {best_match['student_id']}")
         
         return jsonify({
@@ -351,33 +964,207 @@ def recognize_face():
                 'time': now.time().isoformat(),
                 'status': 'present',
                 'confidence_score': round(confidence_score, 2),
+                'match_scope': match_scope,
                 'location_verified': location_verified,
                 'distance_from_school': round(distance, 2)
             }
         })
         
+    except RecognitionBusy as e:
+        metrics.outcome('busy')
+        return busy_response(e)
     except Exception as e:
+        metrics.outcome('error')
         logger.error(f"Error recognizing face: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@app.route('/api/recognize-face', methods=['POST'])
+def recognize_face():
+    """Recognize face and mark attendance"""
+    # Optional claimed identity: verify 1:1 against that student instead of searching everyone
+    return mark_attendance(request.form.get('student_id') or None, recognize_metrics)
+
+@app.route('/api/verify-face', methods=['POST'])
+def verify_face():
+    """Verify a face against the claimed student only and mark attendance"""
+    student_id = request.form.get('student_id')
+    
+    if not student_id:
+        verify_metrics.outcome('invalid_request')
+        return jsonify({'error': 'Missing student_id'}), 400
+    
+    return mark_attendance(student_id, verify_metrics)
+
+@app.route('/api/recognize-class-photo', methods=['POST'])
+def recognize_class_photo():
+    """Recognize every face in a classroom photo and mark attendance in one transaction"""
+    try:
+        if 'image' not in request.files:
+            return jsonify({'error': 'No image file provided'}), 400
+        
+        file = request.files['image']
+        if file.filename == '':
+            return jsonify({'error': 'No file selected'}), 400
+        
+        if not allowed_file(file.filename):
+            return jsonify({'error': 'Invalid file type'}), 400
+        
+        # Get location data of the device taking the photo
+        try:
+            photo_lat = float(request.form.get('latitude', 0))
+            photo_lng = float(request.form.get('longitude', 0))
+        except ValueError:
+            return jsonify({'error': 'Invalid latitude or longitude'}), 400
+        
+        # Optional class/section scope for the photo
+        scope_class = request.form.get('class') or None
+        scope_section = request.form.get('section') or None
+        
+        location_verified, distance, campus = verify_location(photo_lat, photo_lng)
+        
+        if not location_verified:
+            return location_failed_response(distance, campus)
+        
+        # Detect and encode all faces in one pass, straight from the uploaded bytes
+        image_bytes = file.read()
+        face_locations, face_encodings = encode_faces_from_image(image_bytes)
+        
+        if not face_encodings:
+            return jsonify({'error': 'No faces detected in image'}), 400
+        
+        gallery = get_face_gallery()
+        
+        if len(gallery) == 0:
+            return jsonify({'error': 'No registered faces found'}), 400
+        
+        # Match every face against the gallery as one matrix operation
+        probes = np.asarray(face_encodings)
+        matches = gallery.match_many(probes, class_name=scope_class, section=scope_section)
+        
+        if scope_class:
+            missed = [i for i, (_, face_distance) in enumerate(matches) if face_distance > CONFIDENCE_THRESHOLD]
+            if missed:
+                for i, match in zip(missed, gallery.match_many(probes[missed])):
+                    matches[i] = match
+        
+        now = datetime.now()
+        today = now.date()
+        
+        with db_pool.transaction() as conn:
+            cursor = conn.cursor()
+            
+            # One lookup for everyone already marked today
+            matched_ids = list({
+                student['student_id'] for student, face_distance in matches
+                if face_distance <= CONFIDENCE_THRESHOLD
+            })
+            already_marked = set()
+            if matched_ids:
+                placeholders = ','.join('?' * len(matched_ids))
+                cursor.execute(f'''
+                    SELECT student_id FROM attendance_records 
+                    WHERE date = ? AND student_id IN ({placeholders})
+                ''', [today.isoformat()] + matched_ids)
+                already_marked = set(row[0] for row in cursor.fetchall())
+            
+            # Resolve faces in order of confidence so a student matched twice keeps the best face
+            results = [None] * len(matches)
+            new_records = []
+            marked_students = []
+            seen = set()
+            
+            for i in sorted(range(len(matches)), key=lambda i: matches[i][1]):
+                student, face_distance = matches[i]
+                top, right, bottom, left = face_locations[i]
+                result = {
+                    'face_index': i,
+                    'location': {'top': top, 'right': right, 'bottom': bottom, 'left': left},
+                    'student': None,
+                    'confidence_score': None
+                }
+                
+                if face_distance > CONFIDENCE_THRESHOLD:
+                    result['status'] = 'not_recognized'
+                else:
+                    confidence_score = (1 - face_distance) * 100
+                    result['student'] = {
+                        'student_id': student['student_id'],
+                        'name': student['name'],
+                        'class': student['class'],
+                        'section': student['section']
+                    }
+                    result['confidence_score'] = round(confidence_score, 2)
+                    
+                    if student['student_id'] in seen:
+                        result['status'] = 'duplicate_face'
+                    elif student['student_id'] in already_marked:
+                        result['status'] = 'already_marked'
+                    else:
+                        result['status'] = 'marked'
+                        new_records.append((
+                            student['student_id'], today.isoformat(), now.time().isoformat(), 'present',
+                            confidence_score, photo_lat, photo_lng, distance
+                        ))
+                        marked_students.append(student)
+                    seen.add(student['student_id'])
+                
+                results[i] = result
+            
+            # Queue the photo before the rows name it; archive() returns None if it had to drop it
+            photo_filepath = None
+            if ARCHIVE_CHECKIN_IMAGES and new_records:
+                photo_filename = f"class_{now.strftime('%Y%m%d_%H%M%S_%f')}.jpg"
+                photo_filepath = image_archiver.archive(photo_filename, image_bytes)
+            
+            # Insert all new attendance rows (and their rollups) in a single transaction
+            insert_attendance_records(conn, [record + (photo_filepath,) for record in new_records])
+        
+        marked_today.add([record[0] for record in new_records], today.isoformat())
+        attendance_changed(marked_students)
+        
+        logger.info(f"Class photo: {len(new_records)} of {len(matches)} faces marked present")
+        
+        return jsonify({
+            'success': True,
+            'date': today.isoformat(),
+            'time': now.time().isoformat(),
+            'summary': {
+                'faces_detected': len(matches),
+                'marked': len(new_records),
+                'already_marked': sum(1 for r in results if r['status'] == 'already_marked'),
+                'not_recognized': sum(1 for r in results if r['status'] == 'not_recognized')
+            },
+            'results': results
+        })
+        
+    except RecognitionBusy as e:
+        return busy_response(e)
+    except Exception as e:
+        logger.error(f"Error recognizing class photo: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
 @app.route('/api/attendance-history/<student_id>', methods=['GET'])
+@cached_read(lambda student_id: data_versions.get(f"student:{student_id}"))
 def get_attendance_history(student_id):
-    """Get attendance history for a student"""
+    """Get attendance history for a student, newest first
+
+    Pass the returned ``next_cursor`` as ?cursor= for the following page.
+    """
     try:
-        conn = sqlite3.connect('face_attendance.db')
-        cursor = conn.cursor()
+        try:
+            limit = min(max(int(request.args.get('limit', HISTORY_PAGE_SIZE)), 1), HISTORY_MAX_PAGE_SIZE)
+            cursor = request.args.get('cursor')
+            before = decode_cursor(cursor, (str, str, int)) if cursor else None
+        except ValueError:
+            return jsonify({'error': 'Invalid limit or cursor'}), 400
         
-        cursor.execute('''
-            SELECT date, time, status, confidence_score, location_lat, location_lng, distance_from_school
-            FROM attendance_records 
-            WHERE student_id = ?
-            ORDER BY date DESC, time DESC
-            LIMIT 30
-        ''', (student_id,))
+        # One row more than the page tells whether another page follows
+        with db_pool.connection() as conn:
+            rows = attendance_reports.history_page(conn, student_id, limit + 1, before)
         
         records = []
-        for row in cursor.fetchall():
-            date, time, status, confidence, lat, lng, distance = row
+        for row in rows[:limit]:
+            date, time, _, status, confidence, lat, lng, distance = row
             records.append({
                 'date': date,
                 'time': time,
@@ -387,12 +1174,11 @@ def get_attendance_history(student_id):
                 'distance_from_school': distance
             })
         
-        conn.close()
-        
         return jsonify({
             'success': True,
             'student_id': student_id,
-            'records': records
+            'records': records,
+            'next_cursor': encode_cursor(rows[limit - 1][:3]) if len(rows) > limit else None
         })
         
     except Exception as e:
@@ -400,27 +1186,17 @@ def get_attendance_history(student_id):
         return jsonify({'error': 'Internal server error'}), 500
 
 @app.route('/api/attendance-stats/<student_id>', methods=['GET'])
+@cached_read(lambda student_id: (datetime.now().strftime('%Y-%m'),) + data_versions.get(f"student:{student_id}"))
 def get_attendance_stats(student_id):
     """Get attendance statistics for a student"""
     try:
-        conn = sqlite3.connect('face_attendance.db')
-        cursor = conn.cursor()
-        
-        # Get total days and present days for current month
         current_month = datetime.now().strftime('%Y-%m')
-        cursor.execute('''
-            SELECT COUNT(*) as total_days,
-                   SUM(CASE WHEN status = 'present' THEN 1 ELSE 0 END) as present_days
-            FROM attendance_records 
-            WHERE student_id = ? AND date LIKE ?
-        ''', (student_id, f"{current_month}%"))
-        
-        row = cursor.fetchone()
-        total_days = row[0] if row[0] else 0
-        present_days = row[1] if row[1] else 0
-        attendance_percentage = (present_days / total_days * 100) if total_days > 0 else 0
         
-        conn.close()
+        # One row of the monthly rollup instead of scanning the month's records
+        with db_pool.connection() as conn:
+            total_days, present_days = attendance_rollups.student_month(conn, student_id, current_month)
+        
+        attendance_percentage = (present_days / total_days * 100) if total_days > 0 else 0
         
         return jsonify({
             'success': True,
@@ -438,39 +1214,23 @@ def get_attendance_stats(student_id):
         return jsonify({'error': 'Internal server error'}), 500
 
 @app.route('/api/class-attendance/<class_name>/<section>', methods=['GET'])
+@cached_read(lambda class_name, section: (
+    datetime.now().date().isoformat(),) + data_versions.get(class_version(class_name, section))
+)
 def get_class_attendance(class_name, section):
     """Get attendance for entire class"""
     try:
-        conn = sqlite3.connect('face_attendance.db')
-        cursor = conn.cursor()
-        
-        # Get all students in class
-        cursor.execute('''
-            SELECT student_id, name FROM students 
-            WHERE class = ? AND section = ?
-        ''', (class_name, section))
-        
-        students = cursor.fetchall()
-        
-        # Get today's attendance
         today = datetime.now().date()
-        cursor.execute('''
-            SELECT student_id FROM attendance_records 
-            WHERE date = ? AND status = 'present'
-        ''', (today,))
-        
-        present_students = set(row[0] for row in cursor.fetchall())
-        
-        # Prepare response
-        class_attendance = []
-        for student_id, name in students:
-            class_attendance.append({
-                'student_id': student_id,
-                'name': name,
-                'present': student_id in present_students
-            })
         
-        conn.close()
+        # One JOIN over the class roster and that day's records
+        with db_pool.connection() as conn:
+            students = attendance_reports.class_attendance(conn, class_name, section, today.isoformat())
+        
+        class_attendance = [
+            {'student_id': student_id, 'name': name, 'present': present}
+            for student_id, name, present in students
+        ]
+        present_count = sum(1 for student in class_attendance if student['present'])
         
         return jsonify({
             'success': True,
@@ -480,8 +1240,8 @@ def get_class_attendance(class_name, section):
             'attendance': class_attendance,
             'summary': {
                 'total_students': len(students),
-                'present_students': len(present_students),
-                'attendance_percentage': round(len(present_students) / len(students) * 100, 2) if students else 0
+                'present_students': present_count,
+                'attendance_percentage': round(present_count / len(students) * 100, 2) if students else 0
             }
         })
         
@@ -489,30 +1249,332 @@ def get_class_attendance(class_name, section):
         logger.error(f"Error getting class attendance: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@app.route('/api/class-attendance-stats/<class_name>/<section>', methods=['GET'])
+@cached_read(lambda class_name, section: (
+    datetime.now().strftime('%Y-%m'),) + data_versions.get(class_version(class_name, section))
+)
+def get_class_attendance_stats(class_name, section):
+    """Get a class section's attendance statistics for a month (default: current month)"""
+    try:
+        month = request.args.get('month', datetime.now().strftime('%Y-%m'))
+        try:
+            datetime.strptime(month, '%Y-%m')
+        except ValueError:
+            return jsonify({'error': 'Month must be YYYY-MM'}), 400
+        
+        # Rollup rows only: one monthly row plus at most 31 daily ones
+        with db_pool.connection() as conn:
+            marked_days, present_days, school_days = attendance_rollups.class_month(
+                conn, class_name, section, month
+            )
+            total_students = conn.execute(
+                'SELECT COUNT(*) FROM students WHERE class = ? AND section = ?', (class_name, section)
+            ).fetchone()[0]
+        
+        possible_days = total_students * school_days
+        
+        return jsonify({
+            'success': True,
+            'class': class_name,
+            'section': section,
+            'stats': {
+                'month': month,
+                'total_students': total_students,
+                'school_days': school_days,
+                'marked_days': marked_days,
+                'present_days': present_days,
+                'attendance_percentage': round(present_days / possible_days * 100, 2) if possible_days else 0
+            }
+        })
+        
+    except Exception as e:
+        logger.error(f"Error getting class attendance stats: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/api/class-attendance/rollup', methods=['GET'])
+@cached_read(lambda: (datetime.now().date().isoformat(),) + data_versions.get('attendance'))
+def get_class_attendance_rollup():
+    """Per-day, per-class attendance for a date range, e.g. a whole grade for a week"""
+    try:
+        today = datetime.now().date()
+        
+        try:
+            date_from = datetime.strptime(request.args.get('from', today.isoformat()), '%Y-%m-%d').date()
+            date_to = datetime.strptime(request.args.get('to', today.isoformat()), '%Y-%m-%d').date()
+        except ValueError:
+            return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
+        
+        if date_to < date_from or (date_to - date_from).days >= attendance_reports.MAX_ROLLUP_DAYS:
+            return jsonify({
+                'error': f'Date range must be 1 to {attendance_reports.MAX_ROLLUP_DAYS} days'
+            }), 400
+        
+        classes = requested_classes()
+        section = request.args.get('section') or None
+        
+        with db_pool.connection() as conn:
+            rows = attendance_reports.class_rollup(
+                conn, date_from.isoformat(), date_to.isoformat(), classes, section
+            )
+        
+        rollup = [
+            {
+                'date': date,
+                'class': class_name,
+                'section': class_section,
+                'total_students': total,
+                'present_students': present,
+                'attendance_percentage': round(present / total * 100, 2) if total else 0
+            }
+            for date, class_name, class_section, total, present in rows
+        ]
+        
+        return jsonify({
+            'success': True,
+            'from': date_from.isoformat(),
+            'to': date_to.isoformat(),
+            'classes': classes,
+            'section': section,
+            'rollup': rollup
+        })
+        
+    except Exception as e:
+        logger.error(f"Error getting class attendance rollup: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/api/attendance-export', methods=['GET'])
+def export_attendance():
+    """Stream attendance records for a date range, classes or the whole school as NDJSON or CSV"""
+    try:
+        export_format = request.args.get('format', 'ndjson')
+        if export_format not in ('ndjson', 'csv'):
+            return jsonify({'error': "Format must be 'ndjson' or 'csv'"}), 400
+        
+        # Both ends optional; without them the whole history is exported
+        try:
+            date_from, date_to = (
+                datetime.strptime(request.args[arg], '%Y-%m-%d').date().isoformat() if request.args.get(arg) else None
+                for arg in ('from', 'to')
+            )
+        except ValueError:
+            return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
+        
+        classes = requested_classes()
+        section = request.args.get('section') or None
+        
+        pages = export_pages(date_from, date_to, classes, section)
+        if export_format == 'csv':
+            body, mimetype = csv_export(pages), 'text/csv'
+        else:
+            body, mimetype = ndjson_export(pages), 'application/x-ndjson'
+        
+        filename = f"attendance_{date_from or 'start'}_{date_to or 'end'}.{export_format}"
+        response = app.response_class(logged_stream(body, 'attendance export'), mimetype=mimetype)
+        response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+        
+    except Exception as e:
+        logger.error(f"Error exporting attendance: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
+    recognition = recognition_engine.stats()
+    # A dead recognition worker is replaced on the next job; until then uploads may be slow or fail
+    status = 'degraded' if recognition['state'] in ('broken', 'restarting') else 'healthy'
     return jsonify({
-        'status': 'healthy',
+        'status': status,
         'timestamp': datetime.now().isoformat(),
-        'version': '1.0.0'
+        'version': '1.0.0',
+        'batching': {
+            'match': match_batcher.stats(),
+            'attendance': attendance_batcher.stats()
+        },
+        'pipeline': {
+            'register_face': register_metrics.snapshot(),
+            'recognize_face': recognize_metrics.snapshot(),
+            'verify_face': verify_metrics.snapshot(),
+            'kiosk': kiosk_metrics.snapshot()
+        },
+        'recognition': recognition,
+        'verify_cache': student_encodings.stats(),
+        'encoding_cache': upload_encodings.stats(),
+        'response_cache': response_cache.stats()
     })
 
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Stage histograms, outcome counters and gauges in Prometheus text format"""
+    pipelines = [
+        register_metrics, recognize_metrics, verify_metrics, kiosk_metrics, gallery_metrics, database_metrics
+    ]
+    batchers = {'match': match_batcher.stats(), 'attendance': attendance_batcher.stats()}
+    response_stats = response_cache.stats()
+    verify_stats = student_encodings.stats()
+    encoding_stats = upload_encodings.stats()
+    
+    lines = []
+    lines += prometheus_family(
+        'attendance_stage_duration_seconds', 'histogram',
+        'Time spent in each stage of the request pipelines (database: pool_wait and lock_wait)',
+        [sample for pipeline in pipelines for sample in pipeline.stage_samples()]
+    )
+    lines += prometheus_family(
+        'attendance_requests_total', 'counter', 'Finished requests by pipeline and outcome (rejection reason)',
+        [sample for pipeline in pipelines for sample in pipeline.outcome_samples()]
+    )
+    lines += prometheus_family(
+        'attendance_gallery_size', 'gauge', 'Encodings in the resident face gallery',
+        [('', {}, len(face_gallery))]
+    )
+    lines += prometheus_family(
+        'attendance_recognition_pending', 'gauge', 'Detection/encoding jobs queued or running',
+        [('', {}, recognition_engine.pending)]
+    )
+    lines += prometheus_family(
+        'attendance_batch_size', 'histogram', 'Items per micro-batch',
+        [
+            sample for name, stats in batchers.items()
+            for sample in histogram_samples(
+                {'batcher': name}, BATCH_SIZE_BUCKETS,
+                [stats['batch_size_buckets'][str(bound)] for bound in BATCH_SIZE_BUCKETS],
+                stats['items'], stats['batches']
+            )
+        ]
+    )
+    lines += prometheus_family(
+        'attendance_batch_queue_wait_seconds', 'summary', 'Time items waited for their micro-batch',
+        [
+            sample for name, stats in batchers.items()
+            for sample in (('_sum', {'batcher': name}, stats['queue_wait_ms_sum'] / 1000),
+                           ('_count', {'batcher': name}, stats['items']))
+        ]
+    )
+    lines += prometheus_family(
+        'attendance_batch_queue_depth', 'gauge', 'Items waiting for a micro-batch',
+        [('', {'batcher': name}, stats['queue_depth']) for name, stats in batchers.items()]
+    )
+    lines += prometheus_family(
+        'attendance_cache_requests_total', 'counter', 'Cache lookups by cache and result',
+        [
+            ('', {'cache': 'response', 'result': 'hit'}, response_stats['hits']),
+            ('', {'cache': 'response', 'result': 'miss'}, response_stats['misses']),
+            ('', {'cache': 'response', 'result': 'not_modified'}, response_stats['not_modified']),
+            ('', {'cache': 'verify', 'result': 'hit'}, verify_stats['hits']),
+            ('', {'cache': 'verify', 'result': 'miss'}, verify_stats['misses']),
+            ('', {'cache': 'encoding', 'result': 'hit'}, encoding_stats['hits']),
+            ('', {'cache': 'encoding', 'result': 'miss'}, encoding_stats['misses'])
+        ]
+    )
+    lines += prometheus_family(
+        'attendance_encoding_cache_bytes', 'gauge', 'Memory held by cached upload encodings',
+        [('', {}, encoding_stats['bytes'])]
+    )
+    lines += prometheus_family(
+        'attendance_profiler_running', 'gauge', 'Whether the sampling profiler is running',
+        [('', {}, int(profiler.running))]
+    )
+    
+    return app.response_class('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/profiler', methods=['GET'])
+def get_profiler():
+    """Profiler status, or the samples as folded stacks (?format=folded) for flamegraph.pl / speedscope"""
+    if not PROFILER_ENABLED:
+        return jsonify({'error': 'Profiler is disabled'}), 403
+    
+    if request.args.get('format') == 'folded':
+        return app.response_class(profiler.folded(), mimetype='text/plain')
+    return jsonify({'success': True, 'profiler': profiler.stats()})
+
+@app.route('/api/profiler/start', methods=['POST'])
+def start_profiler():
+    """Start sampling stacks, e.g. for a few minutes of the morning rush"""
+    if not PROFILER_ENABLED:
+        return jsonify({'error': 'Profiler is disabled'}), 403
+    
+    try:
+        interval_ms = float(request.args.get('interval_ms', PROFILER_INTERVAL_MS))
+        max_seconds = min(float(request.args.get('seconds', PROFILER_MAX_SECONDS)), PROFILER_MAX_SECONDS)
+    except ValueError:
+        return jsonify({'error': 'interval_ms and seconds must be numbers'}), 400
+    
+    if interval_ms < 1 or max_seconds <= 0:
+        return jsonify({'error': 'interval_ms must be at least 1 and seconds positive'}), 400
+    
+    if not profiler.start(interval_ms=interval_ms, max_seconds=max_seconds):
+        return jsonify({'error': 'Profiler is already running'}), 409
+    
+    logger.info(f"Sampling profiler started ({interval_ms} ms interval, up to {max_seconds} s)")
+    return jsonify({'success': True, 'profiler': profiler.stats()})
+
+@app.route('/api/profiler/stop', methods=['POST'])
+def stop_profiler():
+    """Stop sampling; the samples stay available from GET /api/profiler?format=folded"""
+    if not PROFILER_ENABLED:
+        return jsonify({'error': 'Profiler is disabled'}), 403
+    
+    profiler.stop()
+    logger.info("Sampling profiler stopped")
+    return jsonify({'success': True, 'profiler': profiler.stats()})
+
+@app.route('/api/kiosk', methods=['GET'])
+def get_kiosk():
+    """Gate kiosk status: frame rate, tracked faces and the latest recognitions"""
+    session = kiosk_session
+    return jsonify({'success': True, 'kiosk': session.stats() if session else None})
+
 @app.route('/api/school-location', methods=['GET'])
+@cached_read(lambda: (), max_age=SCHOOL_LOCATION_MAX_AGE, visibility='public')
 def get_school_location():
     """Get school location configuration"""
     return jsonify({
         'success': True,
-        'location': SCHOOL_LOCATION
+        'location': SCHOOL_LOCATION,
+        'campuses': CAMPUSES
     })
 
-if __name__ == '__main__':
+def create_app(warm_up=None, kiosk=None):
+    """Prepare the database, gallery and (unless disabled) warm workers, then return the WSGI app
+
+    Used by the __main__ entry point and by WSGI servers, e.g.
+    ``waitress-serve --call face_recognition_server:create_app``. Importing
+    this module does not load the vision models: without the warm-up
+    (``warm_up=False`` or WARM_UP_ON_START) they are loaded by the first
+    recognition request, and read-only endpoints never need them. The gate
+    kiosk is started when KIOSK_SOURCE is set, unless ``kiosk=False``.
+    """
     # Initialize database
     init_database()
     
-    # Start Flask server
+    # Load registered faces into memory before serving requests
+    get_face_gallery()
+    
+    # Load the dlib models in every worker before accepting traffic
+    if warm_up is None:
+        warm_up = WARM_UP_ON_START
+    if warm_up:
+        recognition_engine.warm_up()
+    
+    # The gate kiosk tracks faces in this process, next to the request threads
+    if kiosk is None:
+        kiosk = KIOSK_SOURCE is not None
+    if kiosk:
+        start_kiosk(KIOSK_SOURCE)
+    
+    return app
+
+if __name__ == '__main__':
+    from waitress import serve
+    
+    create_app()
+    
+    # Start production server
     logger.info("Starting Face Recognition Attendance Server...")
-    logger.info(f"School location: {SCHOOL_LOCATION['latitude']}, {SCHOOL_LOCATION['longitude']}")
-    logger.info(f"Allowed radius: {SCHOOL_LOCATION['radius_km']} km")
+    for campus in CAMPUSES:
+        boundary = f"{campus['radius_km']} km radius" if campus.get('radius_km') is not None else 'polygon boundary'
+        logger.info(f"Campus {campus.get('name', '')}: {campus['latitude']}, {campus['longitude']} ({boundary})")
+    logger.info(f"Listening on http://{SERVER_HOST}:{SERVER_PORT} with {SERVER_THREADS} threads")
     
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    serve(app, host=SERVER_HOST, port=SERVER_PORT, threads=SERVER_THREADS)
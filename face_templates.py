@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Per-student face templates for the AI attendance server
+Several encodings per student in face_templates; students.face_encoding holds their centroid
+"""
+
+import numpy as np
+
+# Templates kept per student and source; the oldest of that source is dropped first
+MAX_TEMPLATES_PER_SOURCE = 5
+
+# A check-in template must differ at least this much from every stored template
+MIN_TEMPLATE_NOVELTY = 0.15
+
+
+def decode(blob):
+    return np.frombuffer(blob, dtype=np.float64)
+
+
+def load_templates(conn, student_id=None):
+    """Map of student_id -> (k x 128) template array, for one student or all of them"""
+    if student_id is None:
+        cursor = conn.execute('SELECT student_id, encoding FROM face_templates ORDER BY student_id, id')
+    else:
+        cursor = conn.execute(
+            'SELECT student_id, encoding FROM face_templates WHERE student_id = ? ORDER BY id',
+            (student_id,)
+        )
+
+    grouped = {}
+    for template_student_id, blob in cursor:
+        grouped.setdefault(template_student_id, []).append(decode(blob))
+    return {key: np.vstack(encodings) for key, encodings in grouped.items()}
+
+
+def watermark(conn):
+    """Highest face_templates id; changes whenever any student's templates do"""
+    return conn.execute('SELECT COALESCE(MAX(id), 0) FROM face_templates').fetchone()[0]
+
+
+def centroid(templates):
+    """Mean encoding used for the first-pass gallery match"""
+    return np.asarray(templates, dtype=np.float64).mean(axis=0)
+
+
+def add_template(conn, student_id, encoding, source, confidence=None,
+                 max_per_source=MAX_TEMPLATES_PER_SOURCE, min_novelty=None):
+    """Store a template and refresh the student's centroid, within the caller's transaction
+
+    With ``min_novelty`` the template is skipped if it is that close to one
+    already stored. Returns (centroid, templates) after the change, or None
+    when skipped.
+    """
+    encoding = np.asarray(encoding, dtype=np.float64)
+    existing = load_templates(conn, student_id).get(student_id)
+
+    if min_novelty is not None and existing is not None:
+        if np.linalg.norm(existing - encoding, axis=1).min() < min_novelty:
+            return None
+
+    conn.execute('''
+        INSERT INTO face_templates (student_id, encoding, source, confidence_score)
+        VALUES (?, ?, ?, ?)
+    ''', (student_id, encoding.tobytes(), source, confidence))
+
+    conn.execute('''
+        DELETE FROM face_templates
+        WHERE student_id = ? AND source = ? AND id NOT IN (
+            SELECT id FROM face_templates
+            WHERE student_id = ? AND source = ?
+            ORDER BY id DESC LIMIT ?
+        )
+    ''', (student_id, source, student_id, source, max_per_source))
+
+    templates = load_templates(conn, student_id)[student_id]
+    student_centroid = centroid(templates)
+    conn.execute(
+        'UPDATE students SET face_encoding = ? WHERE student_id = ?',
+        (student_centroid.tobytes(), student_id)
+    )
+    return student_centroid, templates
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+On-disk gallery snapshot for the AI attendance server
+One contiguous float32 (or float16) centroid matrix, a student-id sidecar and an append log
+"""
+
+import os
+import json
+import struct
+import logging
+import tempfile
+import threading
+import contextlib
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: the snapshot is only safe for one server process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+ENCODING_SIZE = 128
+
+# Log record: id length, UTF-8 student_id, template watermark, then one encoding row
+_RECORD_HEADER = struct.Struct('<I')
+_WATERMARK = struct.Struct('<q')
+
+
+class GalleryStore:
+    """Snapshot of every student's centroid, memory-mapped on load
+
+    ``path`` is a prefix: the matrix is ``<path>.npy``, the row-aligned
+    student IDs ``<path>.ids.json`` and changes since the snapshot
+    ``<path>.log``. The watermark is the highest face_templates id the
+    snapshot reflects, so a database changed behind the server's back (e.g.
+    by bulk enrolment) is detected and the snapshot rebuilt.
+
+    Several server processes may share one store: saving, appending and
+    reading the log hold an exclusive ``fcntl`` lock on ``<path>.lock``, so
+    a log is never emptied while another process is appending to it.
+    changes() then hands each process the records the others appended.
+
+    The matrix is saved with ``headroom`` spare zero rows after the last
+    student and mapped copy-on-write, so a process can apply registrations
+    in place: only the pages holding changed rows become private to it,
+    while the rest of the mapping stays shared with the other processes.
+    """
+
+    def __init__(self, path, dtype='float32', headroom=1024):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.headroom = headroom
+        self.matrix_path = f"{path}.npy"
+        self.ids_path = f"{path}.ids.json"
+        self.log_path = f"{path}.log"
+        self.lock_path = f"{path}.lock"
+        # Snapshot this process has loaded, and how much of its log it has applied
+        self.version = None
+        self.log_offset = 0
+        self._thread_lock = threading.RLock()
+        self._lock_file = None
+        self._lock_depth = 0
+
+    def exists(self):
+        return os.path.exists(self.matrix_path) and os.path.exists(self.ids_path)
+
+    @contextlib.contextmanager
+    def lock(self):
+        """Hold the store against other threads and processes; re-entrant within a thread"""
+        with self._thread_lock:
+            if self._lock_depth == 0 and fcntl is not None:
+                self._lock_file = open(self.lock_path, 'a')
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0 and self._lock_file is not None:
+                    # Closing the file releases the flock
+                    self._lock_file.close()
+                    self._lock_file = None
+
+    def _snapshot_version(self):
+        """Identity of the snapshot on disk; every save() replaces the sidecar with a new file"""
+        try:
+            stat = os.stat(self.ids_path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _log_size(self):
+        try:
+            return os.path.getsize(self.log_path)
+        except FileNotFoundError:
+            return 0
+
+    def _temp_path(self, target):
+        """A fresh file next to ``target``, so concurrent writers never share a temporary"""
+        handle, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(target)), prefix=f"{os.path.basename(target)}.", suffix='.tmp'
+        )
+        os.close(handle)
+        return tmp_path
+
+    def save(self, student_ids, matrix, watermark):
+        """Write a new snapshot, with ``headroom`` spare rows, and empty the log"""
+        matrix = np.asarray(matrix).reshape(-1, ENCODING_SIZE)
+        capacity = len(matrix) + self.headroom
+
+        with self.lock():
+            tmp_matrix = self._temp_path(self.matrix_path)
+            tmp_ids = self._temp_path(self.ids_path)
+            try:
+                # A new file reads as zeros, so the spare rows need no writing
+                stored = np.lib.format.open_memmap(
+                    tmp_matrix, mode='w+', dtype=self.dtype, shape=(capacity, ENCODING_SIZE)
+                )
+                stored[:len(matrix)] = matrix
+                stored.flush()
+                del stored
+
+                with open(tmp_ids, 'w') as f:
+                    json.dump({
+                        'student_ids': list(student_ids),
+                        'watermark': watermark,
+                        'dtype': self.dtype.name,
+                        'capacity': capacity
+                    }, f)
+
+                # Matrix first: a sidecar whose row count disagrees is treated as no snapshot
+                os.replace(tmp_matrix, self.matrix_path)
+                os.replace(tmp_ids, self.ids_path)
+            except BaseException:
+                for tmp_path in (tmp_matrix, tmp_ids):
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                raise
+            if os.path.exists(self.log_path):
+                os.remove(self.log_path)
+            self.version = self._snapshot_version()
+            self.log_offset = 0
+
+    def load(self):
+        """Return (student_ids, matrix, watermark, log_records), or None if there is no usable snapshot
+
+        The matrix is a copy-on-write memory map, shared through the page
+        cache by every process that loads the same file; its first
+        len(student_ids) rows are the students, the rest spare capacity.
+        Writes to it never reach the file. float16 snapshots are widened to
+        float32 in memory.
+        """
+        with self.lock():
+            if not self.exists():
+                return None
+
+            with open(self.ids_path) as f:
+                sidecar = json.load(f)
+
+            matrix = np.load(self.matrix_path, mmap_mode='c')
+            student_ids = sidecar['student_ids']
+
+            if matrix.shape != (sidecar.get('capacity', len(student_ids)), ENCODING_SIZE):
+                logger.warning(f"Gallery snapshot {self.matrix_path} does not match its sidecar, ignoring it")
+                return None
+
+            records, end = self.read_log()
+            if end < self._log_size():
+                # Cut off a record torn by a crash, so the next append starts on a record boundary
+                os.truncate(self.log_path, end)
+            self.version = self._snapshot_version()
+            self.log_offset = end
+
+        if matrix.dtype == np.float16:
+            matrix = matrix.astype(np.float32)
+
+        watermark = max([sidecar['watermark'] or 0] + [record[2] for record in records])
+        return student_ids, matrix, watermark, records
+
+    def changed(self):
+        """Whether another process replaced the snapshot or appended to its log since load(); no locking"""
+        return self._snapshot_version() != self.version or self._log_size() != self.log_offset
+
+    def changes(self):
+        """Log records appended since load() or the last call, or None if the snapshot was replaced
+
+        A None means another process saved a new snapshot, which must be
+        loaded again.
+        """
+        with self.lock():
+            if self._snapshot_version() != self.version:
+                return None
+            records, self.log_offset = self.read_log(self.log_offset)
+            return records
+
+    def append(self, student_id, encoding, watermark):
+        """Log a student's new centroid; replayed on top of the snapshot at the next load"""
+        student_key = student_id.encode('utf-8')
+        row = np.asarray(encoding, dtype=self.dtype).reshape(ENCODING_SIZE)
+
+        record = (_RECORD_HEADER.pack(len(student_key)) + student_key
+                  + _WATERMARK.pack(watermark or 0) + row.tobytes())
+
+        with self.lock():
+            with open(self.log_path, 'ab') as f:
+                start = os.fstat(f.fileno()).st_size
+                # No fsync: the database is the source of truth. A record lost in a crash leaves the
+                # watermark behind face_templates, so the next load() rebuilds the snapshot from it.
+                f.write(record)
+            # The caller has applied its own record; skip it in changes() unless others are still unread
+            if start == self.log_offset and self._snapshot_version() == self.version:
+                self.log_offset = start + len(record)
+
+    def read_log(self, offset=0):
+        """([(student_id, encoding, watermark)] in append order, end offset) from ``offset`` on
+
+        A torn last record is dropped and not counted in the end offset.
+        """
+        if not os.path.exists(self.log_path):
+            return [], 0
+
+        with open(self.log_path, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+
+        records = []
+        start = offset
+        offset = 0
+        row_bytes = ENCODING_SIZE * self.dtype.itemsize
+
+        while offset + _RECORD_HEADER.size <= len(data):
+            (key_length,) = _RECORD_HEADER.unpack_from(data, offset)
+            end = offset + _RECORD_HEADER.size + key_length + _WATERMARK.size + row_bytes
+            if end > len(data):
+                logger.warning(f"Ignoring incomplete record at the end of {self.log_path}")
+                break
+
+            position = offset + _RECORD_HEADER.size
+            student_id = data[position:position + key_length].decode('utf-8')
+            position += key_length
+            (watermark,) = _WATERMARK.unpack_from(data, position)
+            position += _WATERMARK.size
+            encoding = np.frombuffer(data, dtype=self.dtype, count=ENCODING_SIZE, offset=position)
+            records.append((student_id, encoding.astype(np.float32), watermark))
+            offset = end
+
+        return records, start + offset
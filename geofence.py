@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Campus geofencing for the AI attendance server
+Bounding-box prefilter plus spherical distance and point-in-polygon tests
+"""
+
+import math
+from collections import namedtuple
+import numpy as np
+
+# Mean Earth radius (IUGG); within ~0.6% of the ellipsoidal geodesic at campus scale
+EARTH_RADIUS_KM = 6371.0088
+
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180.0
+
+# inside: point is within some campus; distance_km: to that campus (or the nearest one)
+# measured from its reference point; campus: the campus dict it was measured against
+GeofenceResult = namedtuple('GeofenceResult', ['inside', 'distance_km', 'campus'])
+
+
+def _haversine_point_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in kilometres between two points (haversine)"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(a, 1.0)))
+
+
+def _point_in_polygon(lat, lng, polygon):
+    """Even-odd ray casting of a point against a polygon of (lat, lng) vertices
+
+    Works in degrees directly: at campus scale the edges are short enough that
+    the projection does not change which side of the boundary a point is on.
+    """
+    inside = False
+    for (lat_a, lng_a), (lat_b, lng_b) in zip(polygon, polygon[1:] + polygon[:1]):
+        if (lat_a > lat) != (lat_b > lat):
+            if lng < lng_a + (lat - lat_a) * (lng_b - lng_a) / (lat_b - lat_a):
+                inside = not inside
+    return inside
+
+
+class Geofence:
+    """One or more campuses, each a circle (``radius_km``) or a ``polygon``
+
+    Each campus is a dict with ``latitude``/``longitude`` (its reference point,
+    used for reported distances) and either ``radius_km`` or ``polygon`` — a
+    list of (latitude, longitude) vertices. An optional ``name`` is passed
+    through in results.
+    """
+
+    def __init__(self, campuses):
+        if not campuses:
+            raise ValueError("Geofence needs at least one campus")
+
+        self.campuses = [dict(campus) for campus in campuses]
+        for campus in self.campuses:
+            if campus.get('polygon'):
+                campus['polygon'] = [tuple(vertex) for vertex in campus['polygon']]
+        self._boxes = [self._bounding_box(campus) for campus in self.campuses]
+
+    @staticmethod
+    def _bounding_box(campus):
+        """(min_lat, max_lat, min_lng, max_lng) enclosing the campus"""
+        if campus.get('polygon'):
+            vertices = np.asarray(campus['polygon'], dtype=float)
+            return (float(vertices[:, 0].min()), float(vertices[:, 0].max()),
+                    float(vertices[:, 1].min()), float(vertices[:, 1].max()))
+
+        lat_margin = campus['radius_km'] / KM_PER_DEGREE
+        # Widen by the cosine at the pole-ward edge so the box always covers the circle
+        edge_lat = min(89.9, abs(campus['latitude']) + lat_margin)
+        lng_margin = lat_margin / math.cos(math.radians(edge_lat))
+        return (campus['latitude'] - lat_margin, campus['latitude'] + lat_margin,
+                campus['longitude'] - lng_margin, campus['longitude'] + lng_margin)
+
+    def check(self, latitude, longitude):
+        """Locate a single check-in; returns a GeofenceResult"""
+        latitude, longitude = float(latitude), float(longitude)
+
+        for campus, (min_lat, max_lat, min_lng, max_lng) in zip(self.campuses, self._boxes):
+            if not (min_lat <= latitude <= max_lat and min_lng <= longitude <= max_lng):
+                continue
+            if campus.get('polygon'):
+                inside = _point_in_polygon(latitude, longitude, campus['polygon'])
+            else:
+                x = math.radians(longitude - campus['longitude']) * math.cos(
+                    math.radians((latitude + campus['latitude']) / 2)
+                )
+                y = math.radians(latitude - campus['latitude'])
+                inside = EARTH_RADIUS_KM * math.hypot(x, y) <= campus['radius_km']
+            if inside:
+                distance = _haversine_point_km(latitude, longitude, campus['latitude'], campus['longitude'])
+                return GeofenceResult(True, distance, campus)
+
+        # Rejected: report the distance to the nearest campus
+        distances = [
+            _haversine_point_km(latitude, longitude, campus['latitude'], campus['longitude'])
+            for campus in self.campuses
+        ]
+        nearest = distances.index(min(distances))
+        return GeofenceResult(False, distances[nearest], self.campuses[nearest])
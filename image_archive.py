@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Background image archival for the AI attendance server
+Uploaded images are decoded in memory; writing them to disk happens off the request path
+"""
+
+import os
+import queue
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ImageArchiver:
+    """Writes uploaded image bytes to disk on a background thread"""
+
+    def __init__(self, folder, max_pending=256):
+        self.folder = folder
+        self._pending = queue.Queue(maxsize=max_pending)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def archive(self, filename, data):
+        """Queue ``data`` to be written as ``filename``; returns the eventual path
+
+        Returns None (and drops the image) when the queue is full, so a slow
+        disk never holds up attendance marking.
+        """
+        path = os.path.join(self.folder, filename)
+        self._ensure_started()
+
+        try:
+            self._pending.put_nowait((path, data))
+        except queue.Full:
+            logger.warning(f"Image archive queue full, dropping {filename}")
+            return None
+
+        return path
+
+    def flush(self):
+        """Block until every queued image has been written"""
+        self._pending.join()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='image-archiver', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            path, data = self._pending.get()
+            try:
+                with open(path, 'wb') as f:
+                    f.write(data)
+            except Exception as e:
+                logger.error(f"Error archiving image to {path}: {str(e)}")
+            finally:
+                self._pending.task_done()
@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+"""
+Gate kiosk video mode for the AI attendance server
+Follows faces across camera frames with OpenCV trackers and recognizes each face once
+"""
+
+import sys
+import time
+import logging
+import argparse
+import itertools
+import threading
+import contextlib
+from collections import deque
+
+import face_pipeline
+from recognition_engine import RecognitionEngine, RecognitionBusy
+
+logger = logging.getLogger(__name__)
+
+# OpenCV trackers tried, in order, when the configured one is missing from this OpenCV build
+TRACKER_FALLBACKS = ('KCF', 'MOSSE', 'MIL')
+RECENT_EVENTS = 50  # Recognition results kept for the status endpoint
+CROP_MARGIN = 0.5  # Context kept around a face cut out for encoding, as a fraction of its size
+
+
+def create_tracker(kind):
+    """A new OpenCV tracker of ``kind`` (e.g. 'KCF'), from cv2 or the contrib cv2.legacy module"""
+    cv2 = face_pipeline.cv2_module()
+    for module in (cv2, getattr(cv2, 'legacy', None)):
+        factory = getattr(module, f"Tracker{kind}_create", None) if module is not None else None
+        if factory is not None:
+            return factory()
+    return None
+
+
+def available_tracker(preferred):
+    """``preferred`` if this OpenCV build has it, else the first of TRACKER_FALLBACKS that it has"""
+    for kind in (preferred,) + TRACKER_FALLBACKS:
+        if kind and create_tracker(kind) is not None:
+            if kind != preferred:
+                logger.warning(f"OpenCV tracker {preferred} is not available, using {kind}")
+            return kind
+    raise ValueError('No OpenCV tracker is available; install opencv-contrib-python')
+
+
+def box_to_rect(box):
+    """(top, right, bottom, left) to OpenCV's (x, y, width, height)"""
+    top, right, bottom, left = box
+    return (left, top, right - left, bottom - top)
+
+
+def rect_to_box(rect):
+    x, y, width, height = (int(round(value)) for value in rect)
+    return (y, x + width, y + height, x)
+
+
+def overlap(a, b):
+    """Intersection over union of two (top, right, bottom, left) boxes"""
+    height = min(a[2], b[2]) - max(a[0], b[0])
+    width = min(a[1], b[1]) - max(a[3], b[3])
+    if height <= 0 or width <= 0:
+        return 0.0
+    intersection = height * width
+    area_a = (a[2] - a[0]) * (a[1] - a[3])
+    area_b = (b[2] - b[0]) * (b[1] - b[3])
+    return intersection / float(area_a + area_b - intersection)
+
+
+def crop_face(image, box, margin=CROP_MARGIN):
+    """(crop, box within the crop) of one face, with ``margin`` of its size around it for the landmarks"""
+    top, right, bottom, left = box
+    height, width = image.shape[:2]
+    pad_y = int((bottom - top) * margin)
+    pad_x = int((right - left) * margin)
+    y0, x0 = max(0, top - pad_y), max(0, left - pad_x)
+    y1, x1 = min(height, bottom + pad_y), min(width, right + pad_x)
+    return image[y0:y1, x0:x1].copy(), (top - y0, right - x0, bottom - y0, left - x0)
+
+
+def open_frames(source):
+    """Frames of a camera index (e.g. 0 or '0'), video file or stream URL, as BGR arrays"""
+    cv2 = face_pipeline.cv2_module()
+    if isinstance(source, str) and source.isdigit():
+        source = int(source)
+    capture = cv2.VideoCapture(source)
+    if not capture.isOpened():
+        raise ValueError(f"Cannot open video source {source!r}")
+    # Live cameras: keep only the newest frame instead of falling behind a driver queue
+    capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    try:
+        while True:
+            ok, frame = capture.read()
+            if not ok:
+                return
+            yield frame
+    finally:
+        capture.release()
+
+
+class FaceTrack:
+    """One face followed across frames; identified once, or a few times while not recognized"""
+
+    def __init__(self, track_id, box):
+        self.track_id = track_id
+        self.box = box
+        self.tracker = None
+        self.missed = 0
+        self.status = None
+        self.student = None
+        self.attempts = 0
+        self.attempt_frame = None
+        self.attempt_time = None
+
+
+class KioskSession:
+    """Continuous recognition on one video source
+
+    The detector runs on every ``detect_every``-th frame; in between, one
+    OpenCV ``tracker`` per face follows it, which costs a fraction of a
+    detection. Detections are matched to existing tracks by box overlap, so
+    a face stays the same track for as long as it is in view. A track is
+    encoded on the first detection frame where its face is at least
+    ``min_face_size`` pixels tall, and dropped after ``max_missed``
+    detection frames without its face. A face that was not recognized
+    (often the first, blurry or side-on view as someone walks in) is
+    encoded again once ``retry_frames`` frames or ``retry_seconds`` have
+    passed, up to ``max_attempts`` in all.
+
+    Detection and encoding run on ``engine``, the RecognitionEngine that
+    also serves the upload endpoints (inline in this process if None); only
+    face crops are sent for encoding. While the engine is saturated, a
+    detection round is skipped and pending faces wait for the next one.
+
+    New encodings of a frame are passed together to ``identify(encodings)``,
+    which returns a (status, student) pair per encoding, e.g. ('marked',
+    student) or ('not_recognized', None). ``source`` is anything
+    open_frames() accepts, or an iterable of BGR frames.
+    """
+
+    def __init__(self, source, identify, detect_every=5, tracker='KCF', min_face_size=80,
+                 max_missed=2, min_overlap=0.3, retry_frames=15, retry_seconds=1.0, max_attempts=3,
+                 engine=None, metrics=None):
+        self.source = source
+        self.identify = identify
+        self.detect_every = max(1, detect_every)
+        self.tracker = tracker
+        self.min_face_size = min_face_size
+        self.max_missed = max_missed
+        self.min_overlap = min_overlap
+        self.retry_frames = retry_frames
+        self.retry_seconds = retry_seconds
+        self.max_attempts = max(1, max_attempts)
+        self.engine = engine if engine is not None else RecognitionEngine(workers=0)
+        self.metrics = metrics
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._track_ids = itertools.count(1)
+        self._tracks = []
+        self.recent = deque(maxlen=RECENT_EVENTS)
+        self._stats = {
+            'frames': 0, 'detections': 0, 'busy': 0, 'tracks': 0, 'encoded': 0, 'retries': 0,
+            'marked': 0, 'already_marked': 0, 'not_recognized': 0
+        }
+        self._started = None
+        self._stopped = None
+        self.error = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Process the source on a background thread; False if already running"""
+        with self._lock:
+            if self.running:
+                return False
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run, name='kiosk-video', daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self):
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def run(self):
+        """Process frames until the source ends or stop() is called; a failure is kept in ``error``"""
+        frames = open_frames(self.source) if isinstance(self.source, (int, str)) else iter(self.source)
+        self._started = time.time()
+        self._stopped = None
+        self.error = None
+
+        try:
+            if self.tracker:
+                self.tracker = available_tracker(self.tracker)
+            cv2 = face_pipeline.cv2_module()
+            for index in itertools.count():
+                if self._stop.is_set():
+                    break
+                with self._stage('read'):
+                    frame = next(frames, None)
+                if frame is None:
+                    break
+
+                if index % self.detect_every == 0:
+                    self._detect(cv2, frame, index)
+                elif self.tracker:
+                    with self._stage('track'):
+                        self._follow(frame)
+
+                with self._lock:
+                    self._stats['frames'] += 1
+        except Exception as e:
+            self.error = str(e)
+            logger.error(f"Kiosk video stopped: {str(e)}")
+        finally:
+            self._stopped = time.time()
+            if hasattr(frames, 'close'):
+                frames.close()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            tracks = len(self._tracks)
+            recent = list(self.recent)
+        elapsed = (self._stopped or time.time()) - self._started if self._started else 0.0
+        return dict(
+            stats,
+            running=self.running,
+            active_tracks=tracks,
+            frames_per_second=round(stats['frames'] / elapsed, 1) if elapsed else 0.0,
+            detect_every=self.detect_every,
+            tracker=self.tracker,
+            started=self._started,
+            stopped=self._stopped,
+            error=self.error,
+            recent=recent
+        )
+
+    def _stage(self, stage):
+        return self.metrics.stage(stage) if self.metrics is not None else contextlib.nullcontext()
+
+    def _detect(self, cv2, frame, index):
+        """Detect faces, match them to the tracks, then encode and identify the new ones"""
+        image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        try:
+            boxes = self.engine.detect_faces(image, metrics=self.metrics)
+        except RecognitionBusy:
+            # Uploads have the workers: keep following the faces and detect on the next round
+            with self._lock:
+                self._stats['busy'] += 1
+            if self.tracker:
+                with self._stage('track'):
+                    self._follow(frame)
+            return
+
+        # Greedy matching, best overlap first
+        pairs = sorted(
+            ((overlap(track.box, box), track_index, box_index)
+             for track_index, track in enumerate(self._tracks) for box_index, box in enumerate(boxes)),
+            reverse=True
+        )
+        matched_tracks, matched_boxes = set(), set()
+        for score, track_index, box_index in pairs:
+            if score < self.min_overlap:
+                break
+            if track_index in matched_tracks or box_index in matched_boxes:
+                continue
+            matched_tracks.add(track_index)
+            matched_boxes.add(box_index)
+            track = self._tracks[track_index]
+            track.box = boxes[box_index]
+            track.missed = 0
+
+        tracks = []
+        for track_index, track in enumerate(self._tracks):
+            if track_index not in matched_tracks:
+                track.missed += 1
+                if track.missed > self.max_missed:
+                    continue
+            tracks.append(track)
+        for box_index, box in enumerate(boxes):
+            if box_index not in matched_boxes:
+                tracks.append(FaceTrack(next(self._track_ids), box))
+
+        # Re-anchor every tracker on the detected box, so drift never outlives one detection interval
+        if self.tracker and self.detect_every > 1:
+            with self._stage('track'):
+                for track in tracks:
+                    if track.missed == 0:
+                        track.tracker = create_tracker(self.tracker)
+                        track.tracker.init(frame, box_to_rect(track.box))
+
+        pending = [
+            track for track in tracks
+            if track.missed == 0 and track.box[2] - track.box[0] >= self.min_face_size and self._due(track, index)
+        ]
+        with self._lock:
+            self._tracks = tracks
+            self._stats['detections'] += 1
+            self._stats['tracks'] += len(boxes) - len(matched_boxes)
+        if pending:
+            self._identify(image, pending, index)
+
+    def _due(self, track, index):
+        """Whether a track needs (another) identification at frame ``index``"""
+        if track.status is None:
+            return True
+        if track.status != 'not_recognized' or track.attempts >= self.max_attempts:
+            return False
+        return (index - track.attempt_frame >= self.retry_frames
+                or time.monotonic() - track.attempt_time >= self.retry_seconds)
+
+    def _follow(self, frame):
+        """Move every live track with its tracker; a lost face waits for the next detection"""
+        for track in self._tracks:
+            if track.tracker is None:
+                continue
+            ok, rect = track.tracker.update(frame)
+            if ok:
+                track.box = rect_to_box(rect)
+            else:
+                track.tracker = None
+
+    def _identify(self, image, tracks, index):
+        try:
+            encodings = self.engine.encode_crops(
+                [crop_face(image, track.box) for track in tracks], metrics=self.metrics
+            )
+        except RecognitionBusy:
+            # The tracks stay pending and are encoded on a later detection frame
+            with self._lock:
+                self._stats['busy'] += 1
+            return
+
+        encoded = [(track, encoding) for track, encoding in zip(tracks, encodings) if encoding is not None]
+        if not encoded:
+            return
+        tracks = [track for track, _ in encoded]
+        results = self.identify([encoding for _, encoding in encoded])
+
+        with self._lock:
+            self._stats['encoded'] += len(tracks)
+            for track, (status, student) in zip(tracks, results):
+                if track.attempts:
+                    self._stats['retries'] += 1
+                track.attempts += 1
+                track.attempt_frame = index
+                track.attempt_time = time.monotonic()
+                track.status = status
+                track.student = student
+                # Outcomes count attempts, so a face recognized on its retry adds to both
+                self._stats[status] = self._stats.get(status, 0) + 1
+                self.recent.appendleft({
+                    'time': time.time(),
+                    'track': track.track_id,
+                    'attempt': track.attempts,
+                    'status': status,
+                    'student_id': student['student_id'] if student else None,
+                    'name': student['name'] if student else None
+                })
+
+
+def main():
+    """Command line entry point: run the gate kiosk against the server's database, without HTTP"""
+    parser = argparse.ArgumentParser(description='Mark attendance from a camera or video file')
+    parser.add_argument('--source', help='Camera index, video file or stream URL (default: KIOSK_SOURCE, else 0)')
+    parser.add_argument('--detect-every', type=int, help='Run the face detector on every Nth frame')
+    parser.add_argument('--tracker', help="OpenCV tracker, e.g. 'KCF', 'CSRT' or 'MIL'")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    import face_recognition_server as server
+
+    print("🎥 Gate kiosk video mode")
+    print("=" * 50)
+
+    try:
+        # The kiosk is started below, on this thread, rather than by create_app()
+        server.create_app(warm_up=False, kiosk=False)
+        source = args.source if args.source is not None else server.KIOSK_SOURCE
+        session = server.start_kiosk(
+            source if source is not None else '0',
+            detect_every=args.detect_every, tracker=args.tracker, background=False
+        )
+    except KeyboardInterrupt:
+        print("\n⏹️  Stopped")
+        session = server.kiosk_session
+    except Exception as e:
+        print(f"❌ Kiosk failed: {e}")
+        return False
+
+    stats = session.stats() if session else {}
+    if stats.get('error'):
+        print(f"❌ Kiosk failed: {stats['error']}")
+    print(f"\n📊 {stats.get('frames', 0)} frames at {stats.get('frames_per_second', 0)} fps, "
+          f"{stats.get('detections', 0)} detector runs, {stats.get('tracks', 0)} faces tracked")
+    print(f"   Encoded: {stats.get('encoded', 0)}")
+    print(f"   Marked present: {stats.get('marked', 0)}")
+    print(f"   Already marked: {stats.get('already_marked', 0)}")
+    print(f"   Not recognized: {stats.get('not_recognized', 0)}")
+    return not stats.get('error')
+
+
+if __name__ == '__main__':
+    success = main()
+    if not success:
+        sys.exit(1)
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Micro-batching scheduler for the AI attendance server
+Collects work items arriving within a short window and handles them as one batch
+"""
+
+import time
+import queue
+import threading
+import logging
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the batch-size histogram buckets
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+class MicroBatcher:
+    """Group concurrent submissions into batches for a single handler call
+
+    A batch closes when it holds ``max_batch_size`` items or ``window_ms``
+    milliseconds after its first item arrived, whichever comes first. The
+    handler receives the list of items and must return one result per item.
+    """
+
+    def __init__(self, handler, max_batch_size=32, window_ms=10.0, name='micro-batcher'):
+        self.handler = handler
+        self.max_batch_size = max_batch_size
+        self.window_ms = window_ms
+        self.name = name
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._reset_stats()
+
+    def submit(self, item):
+        """Queue ``item`` and return a Future for its result"""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def run(self, item, timeout=None):
+        """Submit ``item`` and wait for its result"""
+        return self.submit(item).result(timeout=timeout)
+
+    def stats(self):
+        """Snapshot of batch-size and queue-wait metrics"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+            counts = list(self._stats['batch_size_counts'])
+        # Non-cumulative counts keyed by the bucket's upper bound
+        stats['batch_size_buckets'] = dict(zip([str(bound) for bound in BATCH_SIZE_BUCKETS] + ['+Inf'], counts))
+        del stats['batch_size_counts']
+        stats['queue_depth'] = self._queue.qsize()
+        stats['mean_batch_size'] = stats['items'] / stats['batches'] if stats['batches'] else 0.0
+        stats['mean_queue_wait_ms'] = stats['queue_wait_ms_sum'] / stats['items'] if stats['items'] else 0.0
+        return stats
+
+    def _reset_stats(self):
+        self._stats = {
+            'batches': 0,
+            'items': 0,
+            'errors': 0,
+            'queue_wait_ms_sum': 0.0,
+            'queue_wait_ms_max': 0.0,
+            'batch_size_counts': [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+        }
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _collect(self):
+        """Block for the first item, then gather more until the batch closes"""
+        batch = [self._queue.get()]
+        deadline = batch[0][2] + self.window_ms / 1000.0
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            items = [item for item, _, _ in batch]
+
+            try:
+                results = self.handler(items)
+                error = None
+            except Exception as e:
+                logger.error(f"Error handling {self.name} batch of {len(items)}: {str(e)}")
+                results, error = None, e
+
+            for index, (_, future, _) in enumerate(batch):
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(results[index])
+
+            self._record(batch, started, error)
+
+    def _record(self, batch, started, error):
+        waits = [(started - enqueued) * 1000 for _, _, enqueued in batch]
+        with self._stats_lock:
+            self._stats['batches'] += 1
+            self._stats['items'] += len(batch)
+            self._stats['errors'] += 1 if error is not None else 0
+            self._stats['queue_wait_ms_sum'] += sum(waits)
+            self._stats['queue_wait_ms_max'] = max(self._stats['queue_wait_ms_max'], max(waits))
+            bucket = next(
+                (index for index, bound in enumerate(BATCH_SIZE_BUCKETS) if len(batch) <= bound),
+                len(BATCH_SIZE_BUCKETS)
+            )
+            self._stats['batch_size_counts'][bucket] += 1
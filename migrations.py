@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Versioned schema migrations for the AI attendance database
+Shared by the server's init_database() and setup_ai_attendance.py
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# (version, description, steps); a step is an SQL string or a callable taking the connection.
+# Append new migrations to the end; never edit one that has shipped.
+MIGRATIONS = [
+    (1, 'Base schema', [
+        '''
+        CREATE TABLE IF NOT EXISTS students (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id TEXT UNIQUE NOT NULL,
+            name TEXT NOT NULL,
+            class TEXT NOT NULL,
+            section TEXT NOT NULL,
+            face_encoding BLOB,
+            face_image_path TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS attendance_records (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id TEXT NOT NULL,
+            date DATE NOT NULL,
+            time TIME NOT NULL,
+            status TEXT NOT NULL,
+            confidence_score REAL,
+            location_lat REAL,
+            location_lng REAL,
+            distance_from_school REAL,
+            image_path TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (student_id) REFERENCES students (student_id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS recognition_sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT UNIQUE NOT NULL,
+            student_id TEXT,
+            status TEXT NOT NULL,
+            confidence_score REAL,
+            location_verified BOOLEAN,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (student_id) REFERENCES students (student_id)
+        )
+        '''
+    ]),
+    (2, 'Attendance indexes and one record per student per day', [
+        # Keep the first record of any day marked twice before the unique index existed
+        '''
+        DELETE FROM attendance_records
+        WHERE id NOT IN (
+            SELECT MIN(id) FROM attendance_records GROUP BY student_id, date
+        )
+        ''',
+        '''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_attendance_student_date
+        ON attendance_records (student_id, date)
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_attendance_date_status
+        ON attendance_records (date, status)
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_students_class_section
+        ON students (class, section)
+        '''
+    ]),
+    (3, 'Multiple face templates per student', [
+        '''
+        CREATE TABLE IF NOT EXISTS face_templates (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id TEXT NOT NULL,
+            encoding BLOB NOT NULL,
+            source TEXT NOT NULL,
+            confidence_score REAL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (student_id) REFERENCES students (student_id)
+        )
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_face_templates_student
+        ON face_templates (student_id)
+        ''',
+        # Each existing encoding becomes the student's first template (and its own centroid)
+        '''
+        INSERT INTO face_templates (student_id, encoding, source)
+        SELECT student_id, face_encoding, 'registration' FROM students
+        WHERE face_encoding IS NOT NULL
+        '''
+    ]),
+    (4, 'Attendance rollups maintained with every insert', [
+        '''
+        CREATE TABLE IF NOT EXISTS student_monthly_attendance (
+            student_id TEXT NOT NULL,
+            month TEXT NOT NULL,
+            total_days INTEGER NOT NULL,
+            present_days INTEGER NOT NULL,
+            PRIMARY KEY (student_id, month)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS class_daily_attendance (
+            date DATE NOT NULL,
+            class TEXT NOT NULL,
+            section TEXT NOT NULL,
+            marked_students INTEGER NOT NULL,
+            present_students INTEGER NOT NULL,
+            PRIMARY KEY (date, class, section)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS class_monthly_attendance (
+            month TEXT NOT NULL,
+            class TEXT NOT NULL,
+            section TEXT NOT NULL,
+            marked_days INTEGER NOT NULL,
+            present_days INTEGER NOT NULL,
+            PRIMARY KEY (month, class, section)
+        )
+        ''',
+        # Backfill from the records kept so far; attendance_rollups.apply() keeps them current
+        '''
+        INSERT INTO student_monthly_attendance (student_id, month, total_days, present_days)
+        SELECT student_id, substr(date, 1, 7), COUNT(*), SUM(status = 'present')
+        FROM attendance_records
+        GROUP BY student_id, substr(date, 1, 7)
+        ''',
+        '''
+        INSERT INTO class_daily_attendance (date, class, section, marked_students, present_students)
+        SELECT a.date, s.class, s.section, COUNT(*), SUM(a.status = 'present')
+        FROM attendance_records a
+        JOIN students s ON s.student_id = a.student_id
+        GROUP BY a.date, s.class, s.section
+        ''',
+        '''
+        INSERT INTO class_monthly_attendance (month, class, section, marked_days, present_days)
+        SELECT substr(date, 1, 7), class, section, SUM(marked_students), SUM(present_students)
+        FROM class_daily_attendance
+        GROUP BY substr(date, 1, 7), class, section
+        '''
+    ]),
+    (5, 'Date-ordered index for paged attendance exports', [
+        # Index entries end with the rowid, so this also orders by (date, id)
+        '''
+        CREATE INDEX IF NOT EXISTS idx_attendance_date
+        ON attendance_records (date)
+        '''
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn):
+    """Current schema version stored in PRAGMA user_version"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(conn):
+    """Apply every pending migration, each in its own transaction
+
+    Returns the resulting schema version.
+    """
+    current = schema_version(conn)
+
+    for version, description, steps in MIGRATIONS:
+        if version <= current:
+            continue
+
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute(f'PRAGMA user_version = {version}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        current = version
+        logger.info(f"Applied database migration {version}: {description}")
+
+    return current
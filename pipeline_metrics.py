@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Per-stage timing for the AI attendance server's request pipelines
+Records how long each stage takes and at which stage requests finish, with Prometheus text output
+"""
+
+import time
+import threading
+
+# Upper bounds (ms) of the stage latency histogram buckets
+LATENCY_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class StageTimer:
+    """Context manager timing one stage of one request"""
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+        self._started = None
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.record(self.stage, (time.perf_counter() - self._started) * 1000)
+        return False
+
+
+class PipelineMetrics:
+    """Stage latencies and outcomes for one pipeline, e.g. recognize_face
+
+    Stages are timed with ``with metrics.stage('encode'):``; the outcome
+    counter shows where requests short-circuit (``metrics.outcome('no_face')``).
+    Each stage also keeps a fixed-bucket latency histogram, so recording is
+    a few additions under a lock.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._outcomes = {}
+
+    def stage(self, stage):
+        """Time a stage: ``with metrics.stage('match'): ...``"""
+        return StageTimer(self, stage)
+
+    def record(self, stage, elapsed_ms):
+        bucket = next(
+            (index for index, bound in enumerate(LATENCY_BUCKETS_MS) if elapsed_ms <= bound),
+            len(LATENCY_BUCKETS_MS)
+        )
+        with self._lock:
+            stats = self._stages.get(stage)
+            if stats is None:
+                stats = self._stages[stage] = {
+                    'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                    'bucket_counts': [0] * (len(LATENCY_BUCKETS_MS) + 1)
+                }
+            stats['count'] += 1
+            stats['total_ms'] += elapsed_ms
+            stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+            stats['bucket_counts'][bucket] += 1
+
+    def outcome(self, outcome):
+        """Count a request that finished with ``outcome``"""
+        with self._lock:
+            self._outcomes[outcome] = self._outcomes.get(outcome, 0) + 1
+
+    def snapshot(self):
+        """Per-stage count/total/mean/max in milliseconds, plus outcome counts"""
+        with self._lock:
+            stages = {
+                stage: {
+                    'count': stats['count'],
+                    'total_ms': stats['total_ms'],
+                    'max_ms': stats['max_ms'],
+                    'mean_ms': stats['total_ms'] / stats['count']
+                }
+                for stage, stats in self._stages.items()
+            }
+            return {'stages': stages, 'outcomes': dict(self._outcomes)}
+
+    def stage_samples(self):
+        """Prometheus histogram samples (seconds) of every stage, labelled with this pipeline"""
+        with self._lock:
+            stages = {stage: dict(stats, bucket_counts=list(stats['bucket_counts']))
+                      for stage, stats in self._stages.items()}
+
+        samples = []
+        for stage, stats in sorted(stages.items()):
+            samples.extend(histogram_samples(
+                {'pipeline': self.name, 'stage': stage},
+                [bound / 1000 for bound in LATENCY_BUCKETS_MS],
+                stats['bucket_counts'], stats['total_ms'] / 1000, stats['count']
+            ))
+        return samples
+
+    def outcome_samples(self):
+        """Prometheus counter samples of finished requests by outcome"""
+        with self._lock:
+            outcomes = dict(self._outcomes)
+        return [
+            ('', {'pipeline': self.name, 'outcome': outcome}, count)
+            for outcome, count in sorted(outcomes.items())
+        ]
+
+
+def histogram_samples(labels, bounds, bucket_counts, total, count):
+    """Samples of one Prometheus histogram from non-cumulative ``bucket_counts``
+
+    ``bucket_counts`` has one entry per bound plus a final overflow bucket.
+    """
+    samples = []
+    cumulative = 0
+    for bound, bucket_count in zip(bounds, bucket_counts):
+        cumulative += bucket_count
+        samples.append(('_bucket', dict(labels, le=f"{bound:g}"), cumulative))
+    samples.append(('_bucket', dict(labels, le='+Inf'), count))
+    samples.append(('_sum', labels, total))
+    samples.append(('_count', labels, count))
+    return samples
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def prometheus_family(name, metric_type, help_text, samples):
+    """Prometheus text-format lines of one metric family
+
+    ``samples`` are (suffix, labels, value) tuples, e.g.
+    ``('_count', {'pipeline': 'recognize_face'}, 12)``.
+    """
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+    for suffix, labels, value in samples:
+        label_text = ','.join(f'{key}="{_escape(label)}"' for key, label in labels.items())
+        lines.append(f"{name}{suffix}{{{label_text}}} {value}" if label_text else f"{name}{suffix} {value}")
+    return lines
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Recognition engine for the AI attendance server
+Runs face detection and encoding on a bounded pool of warm worker processes
+"""
+
+import time
+import threading
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+import face_pipeline
+
+logger = logging.getLogger(__name__)
+
+# Settings of the worker process, set once by the pool initializer
+_worker_settings = None
+
+
+class RecognitionBusy(Exception):
+    """Raised when the engine queue is full or a job timed out"""
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _init_worker(settings):
+    """Load the dlib models once per worker by encoding a blank image"""
+    global _worker_settings
+    _worker_settings = settings
+    face_pipeline.warm_up(settings)
+
+
+def _ping():
+    return True
+
+
+def _decode(image_source, timings):
+    started = time.perf_counter()
+    image = face_pipeline.load_image(image_source)
+    timings['decode'] = (time.perf_counter() - started) * 1000
+    return image
+
+
+def _encode_face_job(image_source, settings=None):
+    """(encoding or None, stage timings in ms)"""
+    timings = {}
+    try:
+        image = _decode(image_source, timings)
+        return face_pipeline.encode_largest_face(image, settings or _worker_settings, timings), timings
+    except Exception as e:
+        logger.error(f"Error encoding face: {str(e)}")
+        return None, timings
+
+
+def _encode_faces_job(image_source, settings=None):
+    """((locations, encodings), stage timings in ms)"""
+    timings = {}
+    try:
+        image = _decode(image_source, timings)
+        return face_pipeline.encode_all_faces(image, settings or _worker_settings, timings), timings
+    except Exception as e:
+        logger.error(f"Error encoding faces: {str(e)}")
+        return ([], []), timings
+
+
+def _detect_faces_job(image, settings=None):
+    """(face boxes in an RGB array, stage timings in ms)"""
+    settings = settings or _worker_settings
+    timings = {}
+    started = time.perf_counter()
+    try:
+        boxes = face_pipeline.detect_faces(
+            image,
+            max_dimension=settings['max_dimension'],
+            model=settings['model'],
+            upsample=settings['upsample']
+        )
+    except Exception as e:
+        logger.error(f"Error detecting faces: {str(e)}")
+        boxes = []
+    timings['detect'] = (time.perf_counter() - started) * 1000
+    return boxes, timings
+
+
+def _encode_crops_job(crops, settings=None):
+    """(encoding or None per (crop, box) pair, stage timings in ms)"""
+    settings = settings or _worker_settings
+    timings = {}
+    started = time.perf_counter()
+    encodings = []
+    for crop, box in crops:
+        try:
+            encodings.append(face_pipeline.encode_faces(crop, [box], settings['num_jitters'])[0])
+        except Exception as e:
+            logger.error(f"Error encoding face: {str(e)}")
+            encodings.append(None)
+    timings['encode'] = (time.perf_counter() - started) * 1000
+    return encodings, timings
+
+
+class RecognitionEngine:
+    """Bounded process pool for detection and encoding
+
+    With ``workers=0`` jobs run inline on the calling thread, which is handy
+    for development and tests. Nothing loads the vision models until the
+    first job or an explicit warm_up(). Given a PipelineMetrics, the encode methods
+    record the worker's 'decode', 'detect' and 'encode' stages, and as
+    'engine_queue' the rest of the wall time (queueing and transfer).
+
+    A worker that dies (killed for memory, or a crash inside dlib) breaks
+    the whole pool; the job that notices replaces it with a freshly warmed
+    one and is retried once.
+    """
+
+    def __init__(self, workers=1, max_pending=8, timeout=10.0, settings=None, retry_after=1):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.settings = dict(settings or face_pipeline.DEFAULT_SETTINGS)
+        self.retry_after = retry_after
+        self._executor = None
+        self._pending = 0
+        self._warm = False
+        self._restarting = False
+        self.restarts = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self):
+        """Jobs submitted and not yet finished"""
+        return self._pending
+
+    @property
+    def ready(self):
+        """Whether warm_up() has loaded the models"""
+        return self._warm
+
+    @property
+    def state(self):
+        """'inline', 'stopped', 'broken', 'restarting', 'cold' (models not loaded yet) or 'ready'"""
+        if self.workers == 0:
+            return 'inline'
+        if self._restarting:
+            return 'restarting'
+        executor = self._executor
+        if executor is None:
+            return 'stopped'
+        # Set by the executor as soon as it notices a dead worker, even with no job running
+        if getattr(executor, '_broken', False):
+            return 'broken'
+        return 'ready' if self._warm else 'cold'
+
+    def stats(self):
+        return {
+            'workers': self.workers,
+            'state': self.state,
+            'warm': self._warm,
+            'pending': self._pending,
+            'restarts': self.restarts
+        }
+
+    def start(self, warm=True):
+        """Start the pool; with ``warm`` block until every worker has loaded its models"""
+        with self._lock:
+            if self.workers and self._executor is None:
+                # spawn: forking a threaded server process is unsafe
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                    initargs=(self.settings,)
+                )
+
+        if warm:
+            self.warm_up()
+
+    def warm_up(self):
+        """Block until the models are loaded, in every worker or (inline) in this process"""
+        if self._warm:
+            return
+        started = time.perf_counter()
+        if self.workers == 0:
+            face_pipeline.warm_up(self.settings)
+        else:
+            self.start(warm=False)
+            for future in [self._executor.submit(_ping) for _ in range(self.workers)]:
+                future.result()
+        self._warm = True
+        workers = f"{self.workers} warm workers" if self.workers else 'inline models'
+        logger.info(f"Recognition engine ready with {workers} in {time.perf_counter() - started:.1f}s")
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+            if self.workers:
+                self._warm = False
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def encode_face(self, image_source, num_jitters=None, metrics=None):
+        """Encoding of the largest face in an image, or None
+
+        ``num_jitters`` overrides the engine setting for this call, e.g. to
+        average more resampled encodings at registration.
+        """
+        settings = None
+        if num_jitters is not None and num_jitters != self.settings['num_jitters']:
+            settings = dict(self.settings, num_jitters=num_jitters)
+        return self._call(_encode_face_job, image_source, settings, metrics)
+
+    def encode_faces(self, image_source, metrics=None):
+        """(locations, encodings) of every face in an image"""
+        return self._call(_encode_faces_job, image_source, None, metrics)
+
+    def detect_faces(self, image, metrics=None):
+        """Face boxes (top, right, bottom, left) in a decoded RGB array, e.g. a video frame"""
+        return self._call(_detect_faces_job, image, None, metrics)
+
+    def encode_crops(self, crops, metrics=None):
+        """Encodings of faces cut out of a larger image, None where encoding failed
+
+        ``crops`` are (RGB crop, face box within the crop) pairs; sending
+        crops rather than the whole frame keeps the transfer to a worker small.
+        """
+        return self._call(_encode_crops_job, crops, None, metrics)
+
+    def _call(self, job, image_source, settings, metrics):
+        started = time.perf_counter()
+        if self.workers == 0:
+            result, timings = job(image_source, settings or self.settings)
+        else:
+            result, timings = self._run(job, image_source, settings)
+
+        if metrics is not None:
+            elapsed = (time.perf_counter() - started) * 1000
+            timings['engine_queue'] = max(0.0, elapsed - sum(timings.values()))
+            for stage, elapsed_ms in timings.items():
+                metrics.record(stage, elapsed_ms)
+        return result
+
+    def _run(self, job, image_source, settings=None):
+        executor = self._current_executor()
+        try:
+            return self._submit(executor, job, image_source, settings)
+        except BrokenProcessPool:
+            logger.error("A recognition worker died; restarting the pool and retrying the job")
+            self._replace(executor)
+            return self._submit(self._current_executor(), job, image_source, settings)
+
+    def _current_executor(self):
+        executor = self._executor
+        if executor is None:
+            self.start(warm=False)
+            executor = self._executor
+        return executor
+
+    def _replace(self, executor):
+        """Swap a broken pool for a new warm one; threads that hit the same pool restart it once"""
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+            self._warm = False
+            self._restarting = True
+            self.restarts += 1
+        try:
+            executor.shutdown(wait=False, cancel_futures=True)
+            self.start(warm=True)
+        finally:
+            self._restarting = False
+
+    def _submit(self, executor, job, image_source, settings):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise RecognitionBusy('Recognition queue is full', self.retry_after)
+            self._pending += 1
+
+        try:
+            future = executor.submit(job, image_source, settings)
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(lambda _: self._release())
+
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise RecognitionBusy('Recognition timed out', self.retry_after)
+
+    def _release(self):
+        with self._lock:
+            self._pending -= 1
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Response cache for the AI attendance server's read endpoints
+Version counters bumped on writes, ETags derived from them, and an LRU of serialized payloads
+"""
+
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+class VersionCounters:
+    """Named counters (e.g. ``student:S1``, ``class:10/A``) bumped whenever their data changes
+
+    Unknown names read as 0. Counters only live in this process, so a
+    response cached under one version is never served after the data it
+    was built from has been written through this server.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions = {}
+
+    def get(self, *names):
+        """Tuple of the current versions of ``names``"""
+        with self._lock:
+            return tuple(self._versions.get(name, 0) for name in names)
+
+    def bump(self, *names):
+        with self._lock:
+            for name in set(names):
+                self._versions[name] = self._versions.get(name, 0) + 1
+
+
+class ResponseCache:
+    """LRU of serialized response bodies keyed by ETag, each kept for at most ``ttl_seconds``
+
+    The ETag of a response is derived from the request and the versions of
+    the data it reads, so it can be computed - and a conditional request
+    answered - without running the query. A random per-process nonce keeps
+    ETags from a previous run (whose counters started from the same values)
+    from matching. The TTL bounds how long a change made outside the server,
+    e.g. by a maintenance script, can go unnoticed.
+    """
+
+    def __init__(self, max_entries=1024, ttl_seconds=30.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._nonce = os.urandom(8).hex()
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def etag(self, key, versions):
+        """ETag of the response for request ``key`` at data ``versions``
+
+        Time-bucketed by the TTL, so clients revalidating an idle endpoint
+        still get a fresh body at least once per TTL.
+        """
+        bucket = int(time.monotonic() // self.ttl_seconds) if self.ttl_seconds else 0
+        digest = hashlib.sha1(f"{self._nonce}|{key}|{versions}|{bucket}".encode('utf-8'))
+        return digest.hexdigest()[:24]
+
+    def get(self, etag):
+        """Cached body for ``etag``, or None"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(etag)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    del self._entries[etag]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(etag)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, etag, body):
+        with self._lock:
+            self._entries[etag] = (body, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(etag)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def record_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'not_modified': self.not_modified
+            }
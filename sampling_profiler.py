@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Opt-in sampling profiler for the AI attendance server
+Periodically samples every thread's stack and aggregates them for flame graphs
+"""
+
+import os
+import sys
+import time
+import threading
+
+# Distinct stacks kept; further new stacks are counted under OVERFLOW_STACK
+MAX_STACKS = 20000
+OVERFLOW_STACK = '[other stacks]'
+
+
+class SamplingProfiler:
+    """Stack sampler for the threads of this process, toggled at runtime
+
+    While running, a daemon thread wakes every ``interval_ms`` and records
+    the stack of every other thread, root frame first and prefixed with the
+    thread's name. Stacks are kept in the folded format read by
+    flamegraph.pl and speedscope: one ``frame;frame;frame count`` line per
+    distinct stack. Sampling stops by itself after ``max_seconds``. Work on
+    the recognition engine's worker processes is not visible here.
+    """
+
+    def __init__(self, interval_ms=10, max_seconds=300):
+        self.interval_ms = interval_ms
+        self.max_seconds = max_seconds
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._stacks = {}
+        self._samples = 0
+        self._started = None
+        self._stopped = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval_ms=None, max_seconds=None):
+        """Clear earlier samples and start sampling; False if already running"""
+        with self._lock:
+            if self.running:
+                return False
+            if interval_ms is not None:
+                self.interval_ms = interval_ms
+            if max_seconds is not None:
+                self.max_seconds = max_seconds
+            self._stacks = {}
+            self._samples = 0
+            self._started = time.time()
+            self._stopped = None
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self):
+        """Stop sampling and keep the samples for folded()"""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def folded(self):
+        """Samples so far as folded stacks, most frequent first"""
+        with self._lock:
+            stacks = sorted(self._stacks.items(), key=lambda item: item[1], reverse=True)
+        return ''.join(f"{stack} {count}\n" for stack, count in stacks)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'running': self.running,
+                'interval_ms': self.interval_ms,
+                'max_seconds': self.max_seconds,
+                'samples': self._samples,
+                'stacks': len(self._stacks),
+                'started': self._started,
+                'stopped': self._stopped
+            }
+
+    def _run(self):
+        deadline = time.monotonic() + self.max_seconds
+        while not self._stop.wait(self.interval_ms / 1000.0):
+            self._sample()
+            if time.monotonic() >= deadline:
+                break
+        with self._lock:
+            self._stopped = time.time()
+
+    def _sample(self):
+        own_ident = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        stacks = []
+
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            frames = []
+            while frame is not None:
+                code = frame.f_code
+                frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            frames.append(names.get(ident, f"thread-{ident}"))
+            stacks.append(';'.join(reversed(frames)))
+
+        with self._lock:
+            self._samples += 1
+            for stack in stacks:
+                if stack not in self._stacks and len(self._stacks) >= MAX_STACKS:
+                    stack = OVERFLOW_STACK
+                self._stacks[stack] = self._stacks.get(stack, 0) + 1
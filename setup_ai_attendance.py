@@ -10,6 +10,8 @@ import subprocess
 import sqlite3
 from pathlib import Path
 
+import migrations
+
 def check_python_version():
     """Check if Python version is compatible"""
     if sys.version_info < (3, 7):
@@ -52,57 +54,9 @@ def initialize_database():
     
     try:
         conn = sqlite3.connect('face_attendance.db')
-        cursor = conn.cursor()
-        
-        # Students table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS students (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                student_id TEXT UNIQUE NOT NULL,
-                name TEXT NOT NULL,
-                class TEXT NOT NULL,
-                section TEXT NOT NULL,
-                face_encoding BLOB,
-                face_image_path TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Attendance records table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS attendance_records (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                student_id TEXT NOT NULL,
-                date DATE NOT NULL,
-                time TIME NOT NULL,
-                status TEXT NOT NULL,
-                confidence_score REAL,
-                location_lat REAL,
-                location_lng REAL,
-                distance_from_school REAL,
-                image_path TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (student_id) REFERENCES students (student_id)
-            )
-        ''')
-        
-        # Recognition sessions table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS recognition_sessions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                session_id TEXT UNIQUE NOT NULL,
-                student_id TEXT,
-                status TEXT NOT NULL,
-                confidence_score REAL,
-                location_verified BOOLEAN,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (student_id) REFERENCES students (student_id)
-            )
-        ''')
-        
-        conn.commit()
+        version = migrations.migrate(conn)
         conn.close()
-        print("✅ Database initialized successfully")
+        print(f"✅ Database initialized successfully (schema version {version})")
         return True
         
     except Exception as e:
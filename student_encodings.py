@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Per-student encoding cache for 1:1 face verification
+Keeps the decoded encodings of recently verified students, least recently used evicted first
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class StudentEncodingCache:
+    """LRU cache of (student, encodings) keyed by student_id
+
+    ``loader(student_id)`` returns (student, encodings) - the student's
+    metadata dict and a (k x 128) array of their stored encodings - or None if
+    the student has no registered face. Misses are not cached, so a student
+    registered later is picked up on their next request.
+    """
+
+    def __init__(self, loader, max_entries=4096):
+        self.loader = loader
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        # Bumped on every invalidation so a load that raced with one is not cached
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, student_id):
+        """(student, encodings) for ``student_id``, or None if not registered"""
+        with self._lock:
+            entry = self._entries.get(student_id)
+            if entry is not None:
+                self._entries.move_to_end(student_id)
+                self.hits += 1
+                return entry
+            self.misses += 1
+            generation = self._generation
+
+        # Load outside the lock; a concurrent load of the same student is harmless
+        entry = self.loader(student_id)
+        if entry is None:
+            return None
+
+        with self._lock:
+            if generation != self._generation:
+                return entry
+            self._entries[student_id] = entry
+            self._entries.move_to_end(student_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, student_id):
+        """Drop a student's entry, e.g. after they re-register"""
+        with self._lock:
+            self._entries.pop(student_id, None)
+            self._generation += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses
+            }
@@ -0,0 +1,76 @@
+"""
+Class attendance counts only the requested class section's students
+"""
+
+import os
+import sys
+from datetime import date
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import attendance_reports
+import database
+import migrations
+
+TODAY = date.today().isoformat()
+
+# (student_id, class, section, status today or None if not marked)
+STUDENTS = [
+    ('S1', '10', 'A', 'present'),
+    ('S2', '10', 'A', 'absent'),
+    ('S3', '10', 'A', None),
+    ('S4', '10', 'B', 'present'),
+    ('S5', '10', 'B', 'present'),
+    ('S6', '9', 'A', 'present'),
+]
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'attendance.db')
+    conn = database.connect(path)
+    migrations.migrate(conn)
+
+    for student_id, class_name, section, status in STUDENTS:
+        conn.execute(
+            'INSERT INTO students (student_id, name, class, section) VALUES (?, ?, ?, ?)',
+            (student_id, f'Student {student_id}', class_name, section)
+        )
+        if status:
+            conn.execute(
+                'INSERT INTO attendance_records (student_id, date, time, status) VALUES (?, ?, ?, ?)',
+                (student_id, TODAY, '08:30:00', status)
+            )
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_class_attendance_lists_only_requested_section(db_path):
+    conn = database.connect(db_path)
+    try:
+        rows = attendance_reports.class_attendance(conn, '10', 'A', TODAY)
+    finally:
+        conn.close()
+
+    assert rows == [('S1', 'Student S1', True), ('S2', 'Student S2', False), ('S3', 'Student S3', False)]
+
+
+def test_route_present_count_ignores_other_classes_same_day(db_path, monkeypatch):
+    server = pytest.importorskip('face_recognition_server')
+    pool = database.ConnectionPool(db_path, size=2)
+    monkeypatch.setattr(server, 'db_pool', pool)
+
+    try:
+        client = server.app.test_client()
+        for class_name, section, total, present in (('10', 'A', 3, 1), ('10', 'B', 2, 2), ('9', 'A', 1, 1)):
+            response = client.get(f'/api/class-attendance/{class_name}/{section}')
+            assert response.status_code == 200
+
+            summary = response.get_json()['summary']
+            assert summary['total_students'] == total
+            assert summary['present_students'] == present
+    finally:
+        pool.close()
@@ -0,0 +1,114 @@
+"""
+Gallery snapshot log: appends reach other processes' stores and survive a reload
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gallery_store import GalleryStore
+
+HEADROOM = 4
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'face_gallery')
+
+
+@pytest.fixture
+def encodings():
+    return np.random.default_rng(0).normal(0.0, 0.1, size=(5, 128)).astype(np.float32)
+
+
+def saved_store(path, encodings):
+    store = GalleryStore(path, headroom=HEADROOM)
+    store.save(['S0', 'S1', 'S2'], encodings[:3], 10)
+    return store
+
+
+def test_save_and_load_round_trip(path, encodings):
+    saved_store(path, encodings)
+
+    student_ids, matrix, watermark, records = GalleryStore(path, headroom=HEADROOM).load()
+
+    assert student_ids == ['S0', 'S1', 'S2']
+    assert matrix.shape == (3 + HEADROOM, 128)
+    np.testing.assert_array_equal(matrix[:3], encodings[:3])
+    assert not matrix[3:].any()
+    assert watermark == 10
+    assert records == []
+
+
+def test_append_reaches_other_store_then_reload(path, encodings):
+    writer = saved_store(path, encodings)
+    reader = GalleryStore(path, headroom=HEADROOM)
+    reader.load()
+    assert not reader.changed()
+
+    writer.append('S3', encodings[3], 11)
+    writer.append('S1', encodings[4], 12)
+
+    assert reader.changed()
+    records = reader.changes()
+    assert [(student_id, watermark) for student_id, _, watermark in records] == [('S3', 11), ('S1', 12)]
+    np.testing.assert_array_equal(records[0][1], encodings[3])
+    np.testing.assert_array_equal(records[1][1], encodings[4])
+    assert not reader.changed()
+    assert reader.changes() == []
+
+    # The writer applied its own records already
+    assert writer.changes() == []
+
+    student_ids, _, watermark, records = GalleryStore(path, headroom=HEADROOM).load()
+    assert student_ids == ['S0', 'S1', 'S2']
+    assert [record[0] for record in records] == ['S3', 'S1']
+    assert watermark == 12
+
+
+def test_replaced_snapshot_is_reported(path, encodings):
+    saved_store(path, encodings)
+    reader = GalleryStore(path, headroom=HEADROOM)
+    reader.load()
+
+    GalleryStore(path, headroom=HEADROOM).save(['S0'], encodings[:1], 20)
+
+    assert reader.changed()
+    assert reader.changes() is None
+
+
+def test_truncated_final_record_is_dropped(path, encodings):
+    writer = saved_store(path, encodings)
+    writer.append('S3', encodings[3], 11)
+    complete = os.path.getsize(writer.log_path)
+    writer.append('S4', encodings[4], 12)
+
+    # A crash part-way through the second record
+    os.truncate(writer.log_path, complete + 20)
+
+    store = GalleryStore(path, headroom=HEADROOM)
+    _, _, watermark, records = store.load()
+
+    assert [record[0] for record in records] == ['S3']
+    assert watermark == 11
+    assert os.path.getsize(store.log_path) == complete
+
+    # Later appends start on a record boundary again
+    store.append('S4', encodings[4], 13)
+    records, _ = GalleryStore(path, headroom=HEADROOM).read_log()
+    assert [record[0] for record in records] == ['S3', 'S4']
+    np.testing.assert_array_equal(records[1][1], encodings[4])
+
+
+def test_copy_on_write_changes_stay_in_memory(path, encodings):
+    saved_store(path, encodings)
+    _, matrix, _, _ = GalleryStore(path, headroom=HEADROOM).load()
+
+    matrix[3] = encodings[3]
+
+    _, reloaded, _, _ = GalleryStore(path, headroom=HEADROOM).load()
+    assert not reloaded[3].any()
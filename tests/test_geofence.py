@@ -0,0 +1,127 @@
+"""
+Geofence accept/reject decisions checked against the geopy geodesic reference
+"""
+
+import os
+import sys
+
+import pytest
+
+geopy_distance = pytest.importorskip('geopy.distance')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from geofence import Geofence
+
+# Sphere vs ellipsoid: decisions may only differ this close to a boundary
+TOLERANCE_KM = 0.005
+# Reported distances use the mean-radius sphere: up to ~0.56% off north-south at the equator
+DISTANCE_REL = 0.006
+LATITUDES = [0.0, 28.6139, 51.5, 64.0]
+BEARINGS = range(0, 360, 30)
+
+
+def destination(lat, lng, bearing, km):
+    point = geopy_distance.geodesic(kilometers=km).destination((lat, lng), bearing)
+    return point.latitude, point.longitude
+
+
+def geodesic_km(lat, lng, campus):
+    return geopy_distance.geodesic((lat, lng), (campus['latitude'], campus['longitude'])).kilometers
+
+
+def circle(latitude, radius_km=0.5):
+    return {'name': 'Main campus', 'latitude': latitude, 'longitude': 77.2090, 'radius_km': radius_km}
+
+
+def square(latitude, half_side_km=0.2):
+    """Square polygon centred on the reference point, built from geodesic offsets"""
+    north, _ = destination(latitude, 77.2090, 0, half_side_km)
+    south, _ = destination(latitude, 77.2090, 180, half_side_km)
+    _, east = destination(latitude, 77.2090, 90, half_side_km)
+    _, west = destination(latitude, 77.2090, 270, half_side_km)
+    return {
+        'name': 'Sports ground', 'latitude': latitude, 'longitude': 77.2090,
+        'polygon': [(south, west), (north, west), (north, east), (south, east)]
+    }
+
+
+@pytest.mark.parametrize('latitude', LATITUDES)
+@pytest.mark.parametrize('fraction', [0.0, 0.5, 0.9, 0.98, 1.02, 1.1, 2.0])
+def test_circle_matches_geodesic(latitude, fraction):
+    campus = circle(latitude)
+    geofence = Geofence([campus])
+
+    for bearing in BEARINGS:
+        lat, lng = destination(campus['latitude'], campus['longitude'], bearing, fraction * campus['radius_km'])
+        result = geofence.check(lat, lng)
+        expected_km = geodesic_km(lat, lng, campus)
+
+        assert result.inside == (expected_km <= campus['radius_km'])
+        assert result.distance_km == pytest.approx(expected_km, rel=DISTANCE_REL, abs=1e-6)
+        assert result.campus['name'] == 'Main campus'
+
+
+@pytest.mark.parametrize('latitude', LATITUDES)
+def test_circle_boundary_within_tolerance(latitude):
+    campus = circle(latitude)
+    geofence = Geofence([campus])
+
+    for bearing in BEARINGS:
+        for offset_km in (-0.001, 0.0, 0.001):
+            lat, lng = destination(
+                campus['latitude'], campus['longitude'], bearing, campus['radius_km'] + offset_km
+            )
+            result = geofence.check(lat, lng)
+            expected_km = geodesic_km(lat, lng, campus)
+
+            if result.inside != (expected_km <= campus['radius_km']):
+                assert abs(expected_km - campus['radius_km']) <= TOLERANCE_KM
+            assert abs(result.distance_km - expected_km) <= TOLERANCE_KM
+
+
+@pytest.mark.parametrize('latitude', LATITUDES)
+def test_polygon_inside_outside(latitude):
+    campus = square(latitude)
+    geofence = Geofence([campus])
+
+    for bearing, km, inside in [
+        (0, 0.0, True), (45, 0.25, True), (90, 0.19, True), (200, 0.15, True),
+        (0, 0.21, False), (90, 0.3, False), (180, 0.25, False), (45, 0.3, False), (300, 1.0, False)
+    ]:
+        lat, lng = destination(campus['latitude'], campus['longitude'], bearing, km)
+        result = geofence.check(lat, lng)
+
+        assert result.inside == inside, (bearing, km)
+        assert result.distance_km == pytest.approx(geodesic_km(lat, lng, campus), rel=DISTANCE_REL, abs=1e-6)
+
+
+@pytest.mark.parametrize('latitude', LATITUDES)
+def test_polygon_boundary_within_tolerance(latitude):
+    campus = square(latitude)
+    geofence = Geofence([campus])
+
+    # Points a couple of metres either side of each edge midpoint
+    for bearing in (0, 90, 180, 270):
+        for offset_km, inside in ((-0.002, True), (0.002, False)):
+            lat, lng = destination(campus['latitude'], campus['longitude'], bearing, 0.2 + offset_km)
+            assert geofence.check(lat, lng).inside == inside, (bearing, offset_km)
+
+
+def test_rejected_point_reports_nearest_campus():
+    main, ground = circle(28.6139), square(28.6180)
+    ground['longitude'] = 77.2150
+    ground['polygon'] = [(lat, lng + 0.0060) for lat, lng in ground['polygon']]
+    geofence = Geofence([main, ground])
+
+    lat, lng = destination(ground['latitude'], ground['longitude'], 90, 0.4)
+    result = geofence.check(lat, lng)
+
+    assert not result.inside
+    assert result.campus['name'] == 'Sports ground'
+    assert result.distance_km == pytest.approx(geodesic_km(lat, lng, ground), rel=DISTANCE_REL)
+
+    lat, lng = destination(ground['latitude'], ground['longitude'], 0, 0.1)
+    result = geofence.check(lat, lng)
+    assert result.inside
+    assert result.campus['name'] == 'Sports ground'